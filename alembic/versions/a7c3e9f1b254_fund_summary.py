@@ -0,0 +1,42 @@
+"""Fund summary
+
+Revision ID: a7c3e9f1b254
+Revises: f2b8d4e6a913
+Create Date: 2026-10-18 19:14:08.662731
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9f1b254'
+down_revision = 'f2b8d4e6a913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'fundsummary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('total_raised', sa.BigInteger(), nullable=False),
+        sa.Column('total_invested', sa.BigInteger(), nullable=False),
+        sa.Column('open_projects', sa.Integer(), nullable=False),
+        sa.Column('closed_projects', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_fundsummary')),
+    )
+    op.execute("""
+        INSERT INTO fundsummary
+            (id, total_raised, total_invested, open_projects, closed_projects)
+        SELECT 1,
+               (SELECT COALESCE(SUM(full_amount), 0) FROM donation),
+               (SELECT COALESCE(SUM(invested_amount), 0) FROM donation),
+               (SELECT COUNT(*) FROM charityproject
+                WHERE NOT fully_invested),
+               (SELECT COUNT(*) FROM charityproject WHERE fully_invested)
+    """)
+
+
+def downgrade():
+    op.drop_table('fundsummary')
@@ -0,0 +1,34 @@
+"""Page order indexes
+
+Revision ID: c4e8a2d6b917
+Revises: a7c3e9f1b254
+Create Date: 2026-10-19 10:21:37.518204
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a2d6b917'
+down_revision = 'a7c3e9f1b254'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_charityproject_create_date_id', 'charityproject'),
+    ('ix_donation_create_date_id', 'donation'),
+)
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.create_index(
+                name, table, ['create_date', 'id'], unique=False,
+                postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table in reversed(INDEXES):
+            op.drop_index(name, table, postgresql_concurrently=True)
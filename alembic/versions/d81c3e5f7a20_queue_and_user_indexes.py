@@ -0,0 +1,48 @@
+"""Queue and user indexes
+
+Revision ID: d81c3e5f7a20
+Revises: b5e2f6a1c9d3
+Create Date: 2026-10-18 13:05:12.904311
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'd81c3e5f7a20'
+down_revision = 'b5e2f6a1c9d3'
+branch_labels = None
+depends_on = None
+
+OPEN = {
+    'postgresql_where': sa.text('NOT fully_invested'),
+    'sqlite_where': sa.text('fully_invested = 0'),
+}
+CLOSED = {
+    'postgresql_where': sa.text('fully_invested'),
+    'sqlite_where': sa.text('fully_invested = 1'),
+}
+INDEXES = (
+    ('ix_charityproject_open', 'charityproject', ['create_date', 'id'], OPEN),
+    ('ix_charityproject_closed', 'charityproject',
+     ['close_date', 'create_date'], CLOSED),
+    ('ix_donation_open', 'donation', ['create_date', 'id'], OPEN),
+    ('ix_donation_user_id_create_date', 'donation',
+     ['user_id', 'create_date'], {}),
+)
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        for name, table, columns, predicate in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_concurrently=True, **predicate)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, *_ in reversed(INDEXES):
+            op.drop_index(name, table, postgresql_concurrently=True)
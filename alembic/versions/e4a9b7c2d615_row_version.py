@@ -0,0 +1,32 @@
+"""Row version
+
+Revision ID: e4a9b7c2d615
+Revises: d81c3e5f7a20
+Create Date: 2026-10-18 16:40:27.518093
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e4a9b7c2d615'
+down_revision = 'd81c3e5f7a20'
+branch_labels = None
+depends_on = None
+
+TABLES = ('charityproject', 'donation')
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(
+                'version', sa.Integer(), server_default=sa.text('1'),
+                nullable=False))
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('version')
@@ -0,0 +1,36 @@
+"""Drop closed project index
+
+Revision ID: e7d1f3a5c842
+Revises: c4e8a2d6b917
+Create Date: 2026-10-19 14:08:26.731940
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e7d1f3a5c842'
+down_revision = 'c4e8a2d6b917'
+branch_labels = None
+depends_on = None
+
+# Closed projects are ordered by close_date - create_date, which
+# ix_charityproject_completion_time serves; this index had no readers.
+INDEX = 'ix_charityproject_closed'
+TABLE = 'charityproject'
+
+
+def upgrade():
+    # DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX, TABLE, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            INDEX, TABLE, ['close_date', 'create_date'], unique=False,
+            postgresql_concurrently=True,
+            postgresql_where=sa.text('fully_invested'),
+            sqlite_where=sa.text('fully_invested = 1'))
@@ -0,0 +1,39 @@
+"""Completion time index
+
+Revision ID: f2b8d4e6a913
+Revises: e4a9b7c2d615
+Create Date: 2026-10-18 17:52:40.316528
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8d4e6a913'
+down_revision = 'e4a9b7c2d615'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_charityproject_completion_time'
+TABLE = 'charityproject'
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.create_index(INDEX, TABLE, [
+            sa.text('(julianday(close_date) - julianday(create_date))'),
+            'id',
+        ], sqlite_where=sa.text('fully_invested = 1'))
+        return
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            INDEX, TABLE, [sa.text('(close_date - create_date)'), 'id'],
+            postgresql_concurrently=True,
+            postgresql_where=sa.text('fully_invested'))
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX, TABLE, postgresql_concurrently=True)
@@ -0,0 +1,30 @@
+from http import HTTPStatus
+
+from fastapi import Request, Response
+
+ETAG_HEADER = 'ETag'
+WEAK_PREFIX = 'W/'
+CONDITIONAL_DESCRIPTION = (
+    f'Ответ содержит заголовок `{ETAG_HEADER}`; если передать его значение '
+    'в `If-None-Match`, неизменившийся список вернётся ответом 304 '
+    'без тела.'
+)
+
+
+def __opaque_tag(etag: str) -> str:
+    etag = etag.strip()
+    return etag[len(WEAK_PREFIX):] if etag.startswith(WEAK_PREFIX) else etag
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Слабое сравнение `If-None-Match` с текущим ETag."""
+    header = request.headers.get('if-none-match')
+    if header is None:
+        return False
+    tags = {__opaque_tag(tag) for tag in header.split(',')}
+    return '*' in tags or __opaque_tag(etag) in tags
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=HTTPStatus.NOT_MODIFIED, headers={ETAG_HEADER: etag})
@@ -1,12 +1,18 @@
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import schemas
-from app.core import (calculate_investments, current_superuser,
-                      get_async_session, settings)
-from app.crud import charity_crud, donation_crud
+from app.api.conditional import (CONDITIONAL_DESCRIPTION, ETAG_HEADER,
+                                 is_not_modified, not_modified)
+from app.api.pagination import (NEXT_CURSOR_HEADER, PAGINATION_DESCRIPTION,
+                                Pagination)
+from app.core import (allocate, calculate_investments, current_superuser,
+                      get_async_session, get_read_session, refresh_expired,
+                      settings)
+from app.core.cache import CachedResponse, project_list_cache, render_json
+from app.crud import charity_crud
 
 router = APIRouter(prefix='/charity_project', tags=['Charity Projects'])
 
@@ -18,12 +24,40 @@ router = APIRouter(prefix='/charity_project', tags=['Charity Projects'])
     summary='Возвращает список всех проектов.',
     description=(
         f'{settings.ALL_USERS}' +
-        'Возвращает список всех проектов.'
+        'Возвращает список всех проектов. ' +
+        PAGINATION_DESCRIPTION + ' ' + CONDITIONAL_DESCRIPTION
     ))
 async def get_all_charity_projects(
-    session: AsyncSession = Depends(get_async_session),
+    request: Request,
+    pagination: Pagination = Depends(),
+    session: AsyncSession = Depends(get_read_session),
 ):
-    return await charity_crud.get_all(session)
+    async def load_etag() -> CachedResponse:
+        return b'', {ETAG_HEADER: await charity_crud.get_etag(session)}
+
+    async def load() -> CachedResponse:
+        if pagination.unpaginated:
+            objs, next_cursor = await charity_crud.get_all(session), None
+        else:
+            objs, next_cursor = await charity_crud.get_page(
+                session, pagination.limit, pagination.after)
+        headers = {}
+        if next_cursor is not None:
+            headers[NEXT_CURSOR_HEADER] = next_cursor
+        return render_json(List[schemas.CharityResponse], objs), headers
+
+    _, etag_headers = await project_list_cache.get_or_load(
+        ETAG_HEADER, load_etag)
+    etag = etag_headers[ETAG_HEADER]
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    body, headers = await project_list_cache.get_or_load(
+        (pagination.limit, pagination.after, pagination.unpaginated), load)
+    return Response(
+        body,
+        media_type='application/json',
+        headers={**headers, ETAG_HEADER: etag},
+    )
 
 
 @router.post(
@@ -41,12 +75,7 @@ async def create_charity_project(
     session: AsyncSession = Depends(get_async_session),
 ):
     new_project = await charity_crud.create(session, payload)
-    await calculate_investments(
-        session,
-        await charity_crud.get_open_projects(session),
-        await donation_crud.get_open_donations(session),
-    )
-    await session.refresh(new_project)
+    await allocate(session, new_project)
     return new_project
 
 
@@ -67,7 +96,7 @@ async def update_charity_project(
 ):
     updated = await charity_crud.update(session, project_id, payload)
     await calculate_investments(session, updated)
-    await session.refresh(updated)
+    await refresh_expired(session, updated)
     return updated
 
 
@@ -1,12 +1,17 @@
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import schemas
-from app.core import (calculate_investments, current_superuser, current_user,
-                      get_async_session, settings)
-from app.crud import charity_crud, donation_crud
+from app.api.conditional import (CONDITIONAL_DESCRIPTION, ETAG_HEADER,
+                                 is_not_modified, not_modified)
+from app.api.export import MEDIA_TYPES, ExportFormat, export_rows
+from app.api.pagination import PAGINATION_DESCRIPTION, Pagination
+from app.core import (allocate, current_superuser, current_user,
+                      get_async_session, get_read_session, settings)
+from app.crud import donation_crud
 from app.models import User
 
 router = APIRouter(prefix='/donation', tags=['Donations'])
@@ -20,12 +25,58 @@ router = APIRouter(prefix='/donation', tags=['Donations'])
     summary='Возвращает список пожертвований.',
     description=(
         f'{settings.SUPER_ONLY}' +
-        'Возвращает список пожертвований.'
+        'Возвращает список пожертвований. ' +
+        PAGINATION_DESCRIPTION
     ))
 async def get_all_donations(
+    response: Response,
+    pagination: Pagination = Depends(),
+    session: AsyncSession = Depends(get_read_session)
+):
+    if pagination.unpaginated:
+        return await donation_crud.get_all(session)
+    return await pagination.get_page(donation_crud, session, response)
+
+
+@router.get(
+    '/export',
+    response_class=StreamingResponse,
+    dependencies=[Depends(current_superuser)],
+    summary='Выгрузка всех пожертвований.',
+    description=(
+        f'{settings.SUPER_ONLY}' +
+        'Потоково выгружает все пожертвования в формате NDJSON или CSV.'
+    ))
+async def export_donations(
+    export_format: ExportFormat = Query(ExportFormat.ndjson, alias='format'),
+    session: AsyncSession = Depends(get_read_session),
+):
+    fields = list(schemas.DonationResponseFull.__fields__)
+    return StreamingResponse(
+        export_rows(
+            fields,
+            donation_crud.stream_columns(
+                session, fields, settings.export_batch_size),
+            export_format,
+        ),
+        media_type=MEDIA_TYPES[export_format],
+    )
+
+
+@router.get(
+    '/allocation',
+    response_model=schemas.AllocationStatus,
+    dependencies=[Depends(current_superuser)],
+    summary='Состояние распределения пожертвований.',
+    description=(
+        f'{settings.SUPER_ONLY}' +
+        'Возвращает число нераспределённых пожертвований и время ожидания '
+        'самого старого из них.'
+    ))
+async def get_allocation_status(
     session: AsyncSession = Depends(get_async_session)
 ):
-    return await donation_crud.get_all(session)
+    return await donation_crud.get_allocation_status(session)
 
 
 @router.get(
@@ -35,13 +86,24 @@ async def get_all_donations(
     summary='Возвращает все пожертвования выполняющего запрос пользователя.',
     description=(
         f'{settings.AUTH_ONLY}' +
-        'Возвращает список пожертвований пользователя, выполняющего запрос.'
+        'Возвращает список пожертвований пользователя, выполняющего запрос. ' +
+        PAGINATION_DESCRIPTION + ' ' + CONDITIONAL_DESCRIPTION
     ))
 async def get_user_donations(
-    session: AsyncSession = Depends(get_async_session),
+    request: Request,
+    response: Response,
+    pagination: Pagination = Depends(),
+    session: AsyncSession = Depends(get_read_session),
     user: User = Depends(current_user)
 ):
-    return await donation_crud.get_user_donations(session, user)
+    etag = await donation_crud.get_etag(session, 'user_id', user.id)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers[ETAG_HEADER] = etag
+    if pagination.unpaginated:
+        return await donation_crud.get_user_donations(session, user)
+    return await pagination.get_page(
+        donation_crud, session, response, 'user_id', user.id)
 
 
 @router.post(
@@ -59,10 +121,5 @@ async def create_donation(
     user: User = Depends(current_user),
 ):
     new_donation = await donation_crud.create(session, payload, user)
-    await calculate_investments(
-        session,
-        await charity_crud.get_open_projects(session),
-        await donation_crud.get_open_donations(session),
-    )
-    await session.refresh(new_donation)
+    await allocate(session, new_donation)
     return new_donation
\ No newline at end of file
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.core import get_read_session, settings
+from app.core.summary import get_summary
+
+router = APIRouter(tags=['Stats'])
+
+
+@router.get(
+    '/stats',
+    response_model=schemas.FundSummary,
+    summary='Итоги фонда.',
+    description=(
+        f'{settings.ALL_USERS}' +
+        'Собранная и распределённая суммы, число открытых и закрытых '
+        'проектов и нераспределённый остаток пожертвований.'
+    ))
+async def get_stats(
+    session: AsyncSession = Depends(get_read_session),
+):
+    return await get_summary(session)
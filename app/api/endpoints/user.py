@@ -1,9 +1,11 @@
 from http import HTTPStatus
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 
+from app.core import current_superuser, settings
+from app.core.password import password_helper
 from app.core.user import auth_backend, fastapi_users
-from app.schemas import UserCreate, UserRead, UserUpdate
+from app.schemas import PasswordHashingStatus, UserCreate, UserRead, UserUpdate
 
 router = APIRouter()
 
@@ -18,6 +20,23 @@ router.include_router(
     prefix='/auth',
     tags=['auth'],
 )
+
+
+@router.get(
+    '/auth/password-hashing',
+    response_model=PasswordHashingStatus,
+    dependencies=[Depends(current_superuser)],
+    tags=['auth'],
+    summary='Состояние пула хеширования паролей.',
+    description=(
+        f'{settings.SUPER_ONLY}' +
+        'Возвращает число хеширований паролей, число задач в пуле и время '
+        'ожидания задач в очереди в секундах.'
+    ))
+def get_password_hashing_status():
+    return password_helper.metrics.as_dict()
+
+
 router.include_router(
     fastapi_users.get_users_router(UserRead, UserUpdate),
     prefix='/users',
@@ -0,0 +1,47 @@
+import csv
+import io
+import json
+from enum import Enum
+from typing import AsyncGenerator, AsyncIterable, List, Sequence
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.engine import Row
+
+
+class ExportFormat(str, Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: 'application/x-ndjson',
+    ExportFormat.csv: 'text/csv',
+}
+
+
+def __to_ndjson(fields: Sequence[str], rows: List[Row]) -> str:
+    return ''.join(
+        json.dumps(jsonable_encoder(dict(zip(fields, row))),
+                   ensure_ascii=False) + '\n'
+        for row in rows)
+
+
+def __to_csv(rows: List[Sequence]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+async def export_rows(
+    fields: Sequence[str],
+    batches: AsyncIterable[List[Row]],
+    export_format: ExportFormat,
+) -> AsyncGenerator[str, None]:
+    """Serializes batches of rows as they arrive from the database."""
+    if export_format == ExportFormat.csv:
+        yield __to_csv([fields])
+    async for rows in batches:
+        if export_format == ExportFormat.csv:
+            yield __to_csv(rows)
+        else:
+            yield __to_ndjson(fields, rows)
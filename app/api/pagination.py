@@ -0,0 +1,47 @@
+from typing import Any, List, Optional
+
+from fastapi import Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import settings
+from app.crud.base import CRUDBase
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+PAGINATION_DESCRIPTION = (
+    'Список отдаётся страницами по `limit` записей, курсор следующей '
+    f'страницы возвращается в заголовке `{NEXT_CURSOR_HEADER}`. '
+    'Весь список одним ответом — только с `unpaginated=true`.'
+)
+
+
+class Pagination:
+    def __init__(
+        self,
+        limit: int = Query(
+            settings.page_size, gt=0, le=settings.page_size_max,
+            description='Размер страницы.'),
+        after: Optional[str] = Query(
+            None,
+            description=(
+                'Курсор страницы из заголовка '
+                f'`{NEXT_CURSOR_HEADER}` предыдущего ответа.')),
+        unpaginated: bool = Query(
+            False, description='Вернуть весь список одним ответом.'),
+    ) -> None:
+        self.limit = limit
+        self.after = after
+        self.unpaginated = unpaginated
+
+    async def get_page(
+        self,
+        crud: CRUDBase,
+        session: AsyncSession,
+        response: Response,
+        attr_name: Optional[str] = None,
+        attr_value: Any = None,
+    ) -> List:
+        objs, next_cursor = await crud.get_page(
+            session, self.limit, self.after, attr_name, attr_value)
+        if next_cursor is not None:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return objs
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import charity_project, donation, user
+from app.api.endpoints import charity_project, donation, stats, user
 from app.google_package import router as google_router
 
 main_router = APIRouter()
@@ -10,6 +10,7 @@ for router in (
     google_router,
     charity_project.router,
     donation.router,
+    stats.router,
     user.router,
 ):
     main_router.include_router(router)
@@ -0,0 +1,40 @@
+"""
+Administrative commands, run from the project root:
+  * python -m app.commands bulk_allocate - distributes all the open
+    donations to the open projects in one vectorized pass, intended for
+    data import and state rebuilds;
+  * python -m app.commands reconcile_summary - recomputes the fund summary
+    from the base tables and prints the drift it corrected;
+"""
+import argparse
+import asyncio
+
+from app.core.db import AsyncSessionLocal
+from app.core.summary import reconcile_summary
+from app.core.utils import calculate_investments_bulk
+
+
+async def bulk_allocate() -> None:
+    async with AsyncSessionLocal() as session:
+        await calculate_investments_bulk(session)
+
+
+async def reconcile() -> None:
+    async with AsyncSessionLocal() as session:
+        print(await reconcile_summary(session) or 'No drift')
+
+
+COMMANDS = {
+    'bulk_allocate': bulk_allocate,
+    'reconcile_summary': reconcile,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python -m app.commands')
+    parser.add_argument('command', choices=COMMANDS)
+    asyncio.run(COMMANDS[parser.parse_args().command]())
+
+
+if __name__ == '__main__':
+    main()
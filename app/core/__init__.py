@@ -1,4 +1,6 @@
 from app.core.config import settings  # noqa
-from app.core.db import Base, get_async_session  # noqa
+from app.core.db import (Base, get_async_session, get_read_session,  # noqa
+                         refresh_expired)
 from app.core.user import current_superuser, current_user  # noqa
-from app.core.utils import calculate_investments  # noqa
+from app.core.utils import calculate_investments, invest  # noqa
+from app.core.allocation import allocate, allocation_coordinator  # noqa
@@ -0,0 +1,177 @@
+"""Фоновое распределение пожертвований.
+
+В режиме `coordinator` эндпоинты ставят идентификаторы новых проектов
+и пожертвований в очередь и ждут результата, а единственная фоновая задача
+забирает очередь пачками и выполняет один проход распределения и один коммит
+на пачку. Так запись в `invested_amount` сериализуется внутри процесса без
+блокировок в БД.
+
+В режиме `deferred` эндпоинты только сохраняют объект, а фоновая задача
+периодически распределяет все открытые проекты и пожертвования.
+
+Отдельная фоновая задача периодически сверяет итоги фонда с данными.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple, Type, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, refresh_expired
+from app.core.summary import reconcile_summary
+from app.core.utils import invest, invest_batch, invest_pending
+
+COORDINATOR_MODE = 'coordinator'
+DEFERRED_MODE = 'deferred'
+
+logger = logging.getLogger(__name__)
+
+ModelType = Type[Union[models.CharityProject, models.Donation]]
+Task = Tuple[ModelType, int, asyncio.Future]
+
+
+class BackgroundWorker:
+
+    def __init__(self, session_factory=AsyncSessionLocal) -> None:
+        self.session_factory = session_factory
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self) -> None:
+        if not self.is_running:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self.is_running:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def _run(self) -> None:
+        raise NotImplementedError('_run()` must be implemented.')
+
+
+class AllocationCoordinator(BackgroundWorker):
+
+    def __init__(self, session_factory=AsyncSessionLocal) -> None:
+        super().__init__(session_factory)
+        self.__queue: Optional[asyncio.Queue] = None
+
+    async def start(self) -> None:
+        if not self.is_running:
+            self.__queue = asyncio.Queue()
+        await super().start()
+
+    async def stop(self) -> None:
+        await super().stop()
+        while self.__queue is not None and not self.__queue.empty():
+            *_, future = self.__queue.get_nowait()
+            future.cancel()
+
+    async def submit(self, model: ModelType, pk: int) -> None:
+        future = asyncio.get_running_loop().create_future()
+        await self.__queue.put((model, pk, future))
+        await future
+
+    def __drain(self, first: Task) -> List[Task]:
+        batch = [first]
+        while (
+            len(batch) < settings.allocation_batch_size and
+            not self.__queue.empty()
+        ):
+            batch.append(self.__queue.get_nowait())
+        return batch
+
+    async def __process(self, batch: List[Task]) -> None:
+        async with self.session_factory() as session:
+            objs = [await session.get(model, pk) for model, pk, _ in batch]
+            await invest_batch(session, [obj for obj in objs if obj])
+
+    async def _run(self) -> None:
+        while True:
+            batch = self.__drain(await self.__queue.get())
+            try:
+                await self.__process(batch)
+            except Exception as error:
+                logger.exception('Ошибка распределения пачки пожертвований')
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+            else:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+            finally:
+                # Остановка во время обработки пачки не должна оставлять
+                # запросы ждать результата вечно.
+                for *_, future in batch:
+                    if not future.done():
+                        future.cancel()
+
+
+class DeferredAllocator(BackgroundWorker):
+
+    async def run_once(self) -> bool:
+        async with self.session_factory() as session:
+            return await invest_pending(
+                session, settings.allocation_batch_size)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                while await self.run_once():
+                    pass
+            except Exception:
+                logger.exception('Ошибка отложенного распределения')
+            await asyncio.sleep(settings.allocation_poll_interval)
+
+
+class SummaryReconciler(BackgroundWorker):
+
+    async def run_once(self) -> Dict[str, int]:
+        async with self.session_factory() as session:
+            return await reconcile_summary(session)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.summary_reconcile_interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception('Ошибка сверки итогов фонда')
+
+
+allocation_coordinator = AllocationCoordinator()
+deferred_allocator = DeferredAllocator()
+summary_reconciler = SummaryReconciler()
+
+
+async def allocate(
+    session: AsyncSession,
+    obj: Union[models.CharityProject, models.Donation],
+) -> None:
+    """Инвестирует новый объект сразу или через фоновое распределение.
+
+    После возврата объект содержит результат распределения.
+    """
+    if settings.allocation_mode == DEFERRED_MODE:
+        return
+    if (
+        settings.allocation_mode == COORDINATOR_MODE and
+        allocation_coordinator.is_running
+    ):
+        await allocation_coordinator.submit(type(obj), obj.id)
+        # Распределение выполнено в сессии координатора.
+        await session.refresh(obj)
+        return
+    await invest(session, obj)
+    await refresh_expired(session, obj)
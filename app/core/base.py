@@ -1,3 +1,4 @@
 """Импорты класса Base и всех моделей для Alembic."""
 from app.core.db import Base  # noqa
-from app.models import CharityProject, Donation, User  # noqa
\ No newline at end of file
+from app.models import (CharityProject, Donation, FundSummary,  # noqa
+                        Investment, User)
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""Кэш готовых ответов публичных читающих эндпоинтов.
+
+Кэш живёт в памяти процесса: записи сбрасываются явно после каждого
+изменения данных в этом процессе, а изменения из других процессов
+становятся видны не позже чем через `ttl` секунд.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from cachetools import TTLCache
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
+
+from app.core.config import settings
+
+CachedResponse = Tuple[bytes, Dict[str, str]]
+
+
+def render_json(response_model: Any, objs: Any) -> bytes:
+    """Сериализует объекты так же, как `response_model_exclude_none`."""
+    return JSONResponse(jsonable_encoder(
+        parse_obj_as(response_model, objs), exclude_none=True)).body
+
+
+class ResponseCache:
+    """Read-through кэш сериализованных ответов с TTL и лимитом по размеру.
+
+    Одновременные промахи по одному ключу объединяются: данные из БД
+    загружает первый запрос, остальные ждут его результата.
+    """
+
+    def __init__(self, ttl: float, max_bytes: int) -> None:
+        self.ttl = ttl
+        self.__cache = TTLCache(
+            max_bytes, ttl, getsizeof=lambda value: len(value[0]))
+        self.__pending: Dict[Hashable, asyncio.Future] = {}
+        self.__generation = 0
+
+    def invalidate(self) -> None:
+        self.__cache.clear()
+        self.__pending = {}
+        self.__generation += 1
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        load: Callable[[], Awaitable[CachedResponse]],
+    ) -> CachedResponse:
+        if not self.ttl:
+            return await load()
+        if key in self.__cache:
+            return self.__cache[key]
+        pending = self.__pending.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+            # Загружавший запрос отменён, данные загружает этот.
+        return await self.__load(key, load)
+
+    async def __load(
+        self,
+        key: Hashable,
+        load: Callable[[], Awaitable[CachedResponse]],
+    ) -> CachedResponse:
+        future = asyncio.get_running_loop().create_future()
+        # Ошибка загрузки уже передана загружавшему запросу: без других
+        # ожидающих она не должна попадать в журнал как необработанная.
+        future.add_done_callback(
+            lambda done: done.cancelled() or done.exception())
+        pending, generation = self.__pending, self.__generation
+        pending[key] = future
+        try:
+            value = await load()
+        except Exception as error:
+            future.set_exception(error)
+            raise
+        else:
+            # Данные, прочитанные до сброса кэша, могут быть устаревшими.
+            if (
+                generation == self.__generation and
+                len(value[0]) <= self.__cache.maxsize
+            ):
+                self.__cache[key] = value
+            future.set_result(value)
+            return value
+        finally:
+            if pending.get(key) is future:
+                del pending[key]
+            if not future.done():
+                future.cancel()
+
+
+project_list_cache = ResponseCache(
+    settings.project_cache_ttl, settings.project_cache_max_bytes)
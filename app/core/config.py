@@ -11,13 +11,74 @@ class Settings(BaseSettings):
         'кошачьей колонии в подвале, на корм оставшимся без попечения '
         'кошкам — на любые цели, связанные с поддержкой кошачьей популяции.')
     database_url: str = 'sqlite+aiosqlite:///./fastapi.db'
+    # Пул соединений с БД (для SQLite не применяется)
+    pool_size: int = 10
+    pool_max_overflow: int = 20
+    pool_timeout: float = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    # 0 отключает кэш подготовленных выражений asyncpg (нужно за pgbouncer)
+    statement_cache_size: int = 100
+    # Миллисекунды, 0 — без ограничения
+    statement_timeout: int = 30000
+    # Реплика для чтения, без неё чтение идёт с основной БД
+    replica_url: Optional[str] = None
+    # Допустимое отставание реплики в секундах, 0 — не проверять
+    replica_max_lag: float = 5.0
+    replica_lag_check_interval: float = 1.0
+    log_level: str = 'INFO'
     secret_key: str = 'SECRET'
     token_lifetime: int = 3600
     token_url: str = 'auth/jwt/login'
+    # Права суперпользователя проверяются по утверждениям JWT без БД
+    superuser_claims: bool = False
+    superuser_token_lifetime: int = 900
+    # Кэш пользователей для проверки токенов, 0 отключает кэш
+    user_cache_ttl: float = 60.0
+    user_cache_max_size: int = 10000
     auth_backend_name = 'jwt'
     password_length = 3
+    # Стоимость bcrypt (log2 числа раундов) и размер пула для хеширования
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    # Ожидание в очереди пула в секундах, после которого пишется
+    # предупреждение, 0 — не предупреждать
+    password_hash_wait_warning: float = 1.0
+    page_size: int = 100
+    page_size_max: int = 1000
+    export_batch_size: int = 1000
+    # Кэш публичного списка проектов, 0 отключает кэш
+    project_cache_ttl: float = 5.0
+    project_cache_max_bytes: int = 16 * 1024 * 1024
     admin_email: Optional[EmailStr] = None
     admin_password: Optional[str] = None
+    # Распределение пожертвований
+    allocation_incremental: bool = True
+    allocation_chunk_size: int = 100
+    # python — цикл в приложении, sql — один запрос (только PostgreSQL)
+    allocation_engine: str = 'python'
+    # inline — в запросе, coordinator — единственной фоновой задачей,
+    # deferred — отложенно, фоновым опросом открытых объектов
+    allocation_mode: str = 'inline'
+    allocation_batch_size: int = 100
+    allocation_poll_interval: float = 1.0
+    allocation_bulk_batch_size: int = 10000
+    # Период сверки итогов фонда в секундах, 0 отключает сверку
+    summary_reconcile_interval: float = 3600.0
+    # Соединения с Google API
+    google_connection_limit: int = 20
+    google_keepalive_timeout: float = 60.0
+    # Кэш discovery-документов Google API, 0 отключает кэш
+    google_discovery_cache_ttl: float = 86400.0
+    google_discovery_cache_path: Optional[str] = None
+    # Параллельные удаления и повторы при превышении квот Google API
+    google_delete_concurrency: int = 10
+    # Размер страницы списка файлов Google Drive, не больше 1000
+    google_page_size: int = 100
+    # Число строк отчёта в одном запросе записи в Google Sheets
+    google_write_chunk_rows: int = 500
+    google_retry_attempts: int = 5
+    google_retry_base_delay: float = 1.0
     # Переменные для Google API
     type: Optional[str] = None
     project_id: Optional[str] = None
@@ -1,11 +1,24 @@
-from typing import AsyncGenerator
+import logging
+import time
+from typing import Any, AsyncGenerator, Dict, Optional
 
-from sqlalchemy import Column, Integer, MetaData
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import Column, Integer, MetaData, exc, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (AsyncEngine, AsyncSession,
+                                    create_async_engine)
 from sqlalchemy.orm import declarative_base, declared_attr, sessionmaker
 
 from app.core.config import settings
 
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+logger = logging.getLogger(__name__)
+
 
 class PreBase:
     @declared_attr
@@ -23,10 +36,138 @@ metadata = MetaData(naming_convention={
     "pk": "pk_%(table_name)s",
 })
 Base = declarative_base(cls=PreBase, metadata=metadata)
-engine = create_async_engine(settings.database_url)
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession)
+
+
+def get_engine_options(database_url: str) -> Dict[str, Any]:
+    """Параметры движка и пула соединений из настроек.
+
+    Пул настраивается только для серверных БД: SQLite работает без пула.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() == 'sqlite':
+        return {}
+    options = {
+        'pool_size': settings.pool_size,
+        'max_overflow': settings.pool_max_overflow,
+        'pool_timeout': settings.pool_timeout,
+        'pool_recycle': settings.pool_recycle,
+        'pool_pre_ping': settings.pool_pre_ping,
+    }
+    if url.get_driver_name() == 'asyncpg':
+        options['connect_args'] = {
+            'statement_cache_size': settings.statement_cache_size,
+            'server_settings': {
+                'statement_timeout': str(settings.statement_timeout),
+            },
+        }
+    return options
+
+
+def describe_pool(engine: AsyncEngine) -> str:
+    """Действующая конфигурация пула для журнала."""
+    options = get_engine_options(str(engine.url))
+    return ', '.join(
+        [f'pool={type(engine.pool).__name__}'] +
+        [f'{name}={value}' for name, value in options.items()])
+
+
+engine = create_async_engine(
+    settings.database_url, **get_engine_options(settings.database_url))
+AsyncSessionLocal = sessionmaker(
+    engine, class_=AsyncSession, expire_on_commit=False)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as async_session:
         yield async_session
+
+
+class ReplicaRouter:
+    """Выбирает реплику или основную БД для читающих запросов.
+
+    Отставание реплики проверяется не чаще раза в `check_interval` секунд.
+    Если реплика отстаёт больше чем на `max_lag` секунд или недоступна,
+    чтение переключается на основную БД.
+    """
+
+    def __init__(
+        self,
+        replica_factory: sessionmaker,
+        primary_factory: sessionmaker = AsyncSessionLocal,
+        max_lag: float = settings.replica_max_lag,
+        check_interval: float = settings.replica_lag_check_interval,
+    ) -> None:
+        self.replica_factory = replica_factory
+        self.primary_factory = primary_factory
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.__checked_at: Optional[float] = None
+        self.__is_fresh = True
+
+    async def __get_lag(self) -> float:
+        async with self.replica_factory() as session:
+            return (await session.execute(REPLICA_LAG_SQL)).scalar() or 0
+
+    async def get_session_factory(self) -> sessionmaker:
+        if not self.max_lag:
+            return self.replica_factory
+        now = time.monotonic()
+        if (
+            self.__checked_at is None or
+            now - self.__checked_at >= self.check_interval
+        ):
+            self.__checked_at = now
+            try:
+                self.__is_fresh = await self.__get_lag() <= self.max_lag
+            except (exc.SQLAlchemyError, OSError):
+                logger.warning('Реплика БД недоступна', exc_info=True)
+                self.__is_fresh = False
+        if self.__is_fresh:
+            return self.replica_factory
+        return self.primary_factory
+
+
+async def __get_replica_session() -> AsyncGenerator[AsyncSession, None]:
+    session_factory = await replica_router.get_session_factory()
+    async with session_factory() as async_session:
+        yield async_session
+
+
+if settings.replica_url is None:
+    replica_engine = None
+    replica_router = None
+    # Тот же объект зависимости, что и для записи: переопределения
+    # `get_async_session` действуют и на чтение.
+    get_read_session = get_async_session
+else:
+    replica_engine = create_async_engine(
+        settings.replica_url, **get_engine_options(settings.replica_url))
+    replica_router = ReplicaRouter(sessionmaker(
+        replica_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    ))
+    get_read_session = __get_replica_session
+
+
+def describe_pool_status() -> str:
+    """Состояние пулов основной БД и реплики для журнала.
+
+    `TimeoutError` пула не указывает, какой из пулов исчерпан,
+    поэтому выводятся оба.
+    """
+    engines = [('primary', engine), ('replica', replica_engine)]
+    return '; '.join(
+        f'{name}: {pool_engine.pool.status()}'
+        for name, pool_engine in engines if pool_engine is not None)
+
+
+async def refresh_expired(session: AsyncSession, obj: Base) -> None:
+    """Перечитывает объект, только если коммит сбросил его атрибуты.
+
+    Сессии приложения создаются с `expire_on_commit=False`, и для них
+    лишнего SELECT не происходит. Счётчик `version` вычисляется в самом
+    UPDATE и в ответах не используется, его сброс не учитывается.
+    """
+    if inspect(obj).expired_attributes - {'version'}:
+        await session.refresh(obj)
@@ -0,0 +1,106 @@
+"""Хеширование паролей вне цикла событий.
+
+bcrypt занимает процессор на десятки и сотни миллисекунд, поэтому хеши
+считаются в отдельном пуле потоков ограниченного размера: библиотека
+bcrypt освобождает GIL, и остальные запросы продолжают обслуживаться.
+Время ожидания задач в очереди пула собирается в метриках.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi_users.password import PasswordHelper
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHashMetrics:
+    """Число задач и время их ожидания в очереди пула в секундах."""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.pending = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def observe(self, wait: float) -> None:
+        self.calls += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        if (
+            settings.password_hash_wait_warning and
+            wait > settings.password_hash_wait_warning
+        ):
+            logger.warning(
+                'Хеширование пароля ожидало в очереди %.3f с', wait)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'pending': self.pending,
+            'wait_avg': self.wait_total / self.calls if self.calls else 0.0,
+            'wait_max': self.wait_max,
+        }
+
+
+class AsyncPasswordHelper(PasswordHelper):
+    """`PasswordHelper` с асинхронными методами, работающими в пуле потоков.
+
+    Синхронные методы базового класса остаются для совместимости
+    с fastapi-users, `UserManager` вызывает асинхронные.
+    """
+
+    def __init__(self, rounds: int, workers: int) -> None:
+        super().__init__(CryptContext(
+            schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=rounds))
+        self.workers = workers
+        self.metrics = PasswordHashMetrics()
+        self.__executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self.__executor is None:
+            self.__executor = ThreadPoolExecutor(
+                self.workers, thread_name_prefix='password-hash')
+        return self.__executor
+
+    def shutdown(self) -> None:
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+
+    async def __run(self, func: Callable, *args: Any) -> Any:
+        submitted = time.monotonic()
+
+        def timed() -> Tuple[float, Any]:
+            return time.monotonic() - submitted, func(*args)
+
+        self.metrics.pending += 1
+        try:
+            wait, result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, timed)
+        finally:
+            self.metrics.pending -= 1
+        self.metrics.observe(wait)
+        return result
+
+    async def hash_async(self, password: str) -> str:
+        return await self.__run(self.hash, password)
+
+    async def verify_and_update_async(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        return await self.__run(
+            self.verify_and_update, plain_password, hashed_password)
+
+
+password_helper = AsyncPasswordHelper(
+    settings.bcrypt_rounds, settings.password_hash_workers)
@@ -0,0 +1,98 @@
+"""Итоги фонда в таблице `fundsummary`.
+
+Создание и удаление объектов и каждое распределение прибавляют свои
+изменения к единственной строке итогов в той же транзакции, поэтому
+итоги читаются без агрегатов по базовым таблицам. Сверка пересчитывает
+итоги по базовым таблицам и сообщает о расхождениях.
+"""
+import logging
+from typing import Dict
+
+from sqlalchemy import false, func, insert, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.models.fund_summary import SUMMARY_ID
+
+SUMMARY_FIELDS = (
+    'total_raised', 'total_invested', 'open_projects', 'closed_projects')
+
+logger = logging.getLogger(__name__)
+
+
+async def update_summary(
+    session: AsyncSession,
+    raised: int = 0,
+    invested: int = 0,
+    opened: int = 0,
+    closed: int = 0,
+) -> None:
+    """Прибавляет изменения к итогам фонда в текущей транзакции.
+
+    `opened` — изменение числа открытых проектов при создании и удалении,
+    `closed` — число проектов, закрытых распределением.
+    """
+    if not any((raised, invested, opened, closed)):
+        return
+    table = models.FundSummary.__table__
+    await session.execute(
+        update(table).where(table.c.id == SUMMARY_ID).values(
+            total_raised=table.c.total_raised + raised,
+            total_invested=table.c.total_invested + invested,
+            open_projects=table.c.open_projects + opened - closed,
+            closed_projects=table.c.closed_projects + closed,
+        ))
+
+
+async def get_summary(session: AsyncSession) -> models.FundSummary:
+    return await session.get(models.FundSummary, SUMMARY_ID)
+
+
+def __count(model, *criteria):
+    return select(func.count(model.id)).where(*criteria).scalar_subquery()
+
+
+def __total(column):
+    return select(func.coalesce(func.sum(column), 0)).scalar_subquery()
+
+
+async def reconcile_summary(session: AsyncSession) -> Dict[str, int]:
+    """Пересчитывает итоги по базовым таблицам.
+
+    Строка итогов блокируется до подсчёта, поэтому приращения
+    параллельных транзакций не теряются. Возвращает расхождения
+    `пересчитанное - сохранённое` по каждому полю.
+    """
+    table = models.FundSummary.__table__
+    stored = (await session.execute(
+        select(*(table.c[field] for field in SUMMARY_FIELDS))
+        .where(table.c.id == SUMMARY_ID)
+        .with_for_update()
+    )).first()
+    actual = (await session.execute(select(
+        __total(models.Donation.full_amount),
+        __total(models.Donation.invested_amount),
+        __count(
+            models.CharityProject,
+            models.CharityProject.fully_invested == false()),
+        __count(
+            models.CharityProject,
+            models.CharityProject.fully_invested == true()),
+    ))).one()
+    actual = dict(zip(SUMMARY_FIELDS, actual))
+    if stored is None:
+        await session.execute(insert(table).values(id=SUMMARY_ID, **actual))
+        drift = actual
+    else:
+        drift = {
+            field: actual[field] - stored[index]
+            for index, field in enumerate(SUMMARY_FIELDS)
+            if actual[field] != stored[index]}
+        if drift:
+            await session.execute(
+                update(table).where(table.c.id == SUMMARY_ID).values(
+                    **actual))
+    await session.commit()
+    if drift:
+        logger.warning('Итоги фонда расходились с данными: %s', drift)
+    return drift
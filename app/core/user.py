@@ -1,15 +1,24 @@
-from typing import Optional, Union
+import time
+from http import HTTPStatus
+from typing import Any, Dict, Optional, Union
 
-from fastapi import Depends, Request
+import jwt
+from cachetools import TTLCache
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users import (BaseUserManager, FastAPIUsers, IntegerIDMixin,
-                           InvalidPasswordException)
+                           InvalidPasswordException, exceptions)
 from fastapi_users.authentication import (AuthenticationBackend,
                                           BearerTransport, JWTStrategy)
+from fastapi_users.jwt import decode_jwt, generate_jwt
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
 from app.core.config import settings
 from app.core.db import get_async_session
+from app.core.password import password_helper
 from app.models.user import User
 from app.schemas.user import UserCreate
 
@@ -18,21 +27,200 @@ async def get_user_db(session: AsyncSession = Depends(get_async_session)):
     yield SQLAlchemyUserDatabase(session, User)
 
 
+class TokenRevocation:
+    """Моменты отзыва токенов пользователей в памяти процесса.
+
+    Записи хранятся не дольше срока действия токена: более старые токены
+    отклоняются и так. Отзыв из другого процесса не виден, такие токены
+    перестают действовать по истечении `superuser_token_lifetime`.
+    """
+
+    def __init__(self, ttl: float, max_size: int) -> None:
+        self.__revoked = TTLCache(max_size, ttl)
+
+    def revoke(self, id: int) -> None:
+        self.__revoked[id] = time.time()
+
+    def is_revoked(self, id: int, issued_at: float) -> bool:
+        revoked_at = self.__revoked.get(id)
+        return revoked_at is not None and issued_at <= revoked_at
+
+    def clear(self) -> None:
+        self.__revoked.clear()
+
+
+token_revocation = TokenRevocation(
+    settings.token_lifetime, settings.user_cache_max_size)
+
+
+class ClaimsJWTStrategy(JWTStrategy):
+    """JWT с флагами `is_active` и `is_superuser` в утверждениях.
+
+    Токены суперпользователей выдаются на `superuser_token_lifetime`,
+    чтобы снятие прав действовало быстро и без отзыва.
+    """
+
+    async def write_token(self, user: User) -> str:
+        data = {
+            'user_id': str(user.id),
+            'aud': self.token_audience,
+            'iat': time.time(),
+            'is_active': user.is_active,
+            'is_superuser': user.is_superuser,
+        }
+        lifetime = self.lifetime_seconds
+        if user.is_superuser:
+            lifetime = min(
+                lifetime or settings.superuser_token_lifetime,
+                settings.superuser_token_lifetime)
+        return generate_jwt(
+            data, self.encode_key, lifetime, algorithm=self.algorithm)
+
+    def read_claims(self, token: Optional[str]) -> Optional[User]:
+        """Возвращает пользователя из утверждений токена без запроса к БД.
+
+        `None` означает, что утверждений нет или токен отозван, и
+        пользователя нужно загрузить из БД.
+        """
+        if token is None:
+            return None
+        try:
+            data = decode_jwt(
+                token, self.decode_key, self.token_audience,
+                algorithms=[self.algorithm])
+            user = User(
+                id=int(data['user_id']),
+                is_active=bool(data['is_active']),
+                is_superuser=bool(data['is_superuser']),
+            )
+            issued_at = float(data['iat'])
+        except (jwt.PyJWTError, KeyError, TypeError, ValueError):
+            return None
+        if token_revocation.is_revoked(user.id, issued_at):
+            return None
+        return user
+
+
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(
+    strategy_class = (
+        ClaimsJWTStrategy if settings.superuser_claims else JWTStrategy)
+    return strategy_class(
         secret=settings.secret_key,
         lifetime_seconds=settings.token_lifetime
     )
 
 
+bearer_transport = BearerTransport(tokenUrl=settings.token_url)
+
 auth_backend = AuthenticationBackend(
     name=settings.auth_backend_name,
-    transport=BearerTransport(tokenUrl=settings.token_url),
+    transport=bearer_transport,
     get_strategy=get_jwt_strategy,
 )
 
 
+class UserCache:
+    """Кэш строк пользователей для проверки токенов без запроса к БД.
+
+    Подпись и срок действия токена проверяются при каждом запросе, из кэша
+    берутся только данные пользователя. Изменения через `UserManager`
+    сбрасывают запись сразу, изменения из других процессов становятся
+    видны не позже чем через `ttl` секунд.
+    """
+
+    def __init__(self, ttl: float, max_size: int) -> None:
+        self.ttl = ttl
+        self.__cache = TTLCache(max_size, ttl or 1)
+
+    def get(self, id: int) -> Optional[Dict[str, Any]]:
+        if not self.ttl:
+            return None
+        return self.__cache.get(id)
+
+    def set(self, user: User) -> None:
+        if self.ttl:
+            self.__cache[user.id] = {
+                attr.key: getattr(user, attr.key)
+                for attr in inspect(User).column_attrs
+            }
+
+    def invalidate(self, id: Optional[int] = None) -> None:
+        if id is None:
+            self.__cache.clear()
+        else:
+            self.__cache.pop(id, None)
+
+
+user_cache = UserCache(settings.user_cache_ttl, settings.user_cache_max_size)
+
+
 class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
+    """Менеджер пользователей, хеширующий пароли в пуле потоков.
+
+    `create`, `authenticate` и `_update` повторяют реализацию fastapi-users,
+    но вызывают асинхронные методы `password_helper`.
+    """
+
+    async def get(self, id: int) -> User:
+        values = user_cache.get(id)
+        if values is None:
+            user = await super().get(id)
+            user_cache.set(user)
+            return user
+        # Объект из кэша привязывается к сессии запроса без SELECT.
+        user = User(**values)
+        make_transient_to_detached(user)
+        return await self.user_db.session.merge(user, load=False)
+
+    async def create(
+        self,
+        user_create: UserCreate,
+        safe: bool = False,
+        request: Optional[Request] = None,
+    ) -> User:
+        await self.validate_password(user_create.password, user_create)
+        if await self.user_db.get_by_email(user_create.email) is not None:
+            raise exceptions.UserAlreadyExists()
+        user_dict = (
+            user_create.create_update_dict()
+            if safe
+            else user_create.create_update_dict_superuser()
+        )
+        user_dict['hashed_password'] = await self.password_helper.hash_async(
+            user_dict.pop('password'))
+        created_user = await self.user_db.create(user_dict)
+        await self.on_after_register(created_user, request)
+        return created_user
+
+    async def authenticate(
+        self, credentials: OAuth2PasswordRequestForm
+    ) -> Optional[User]:
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Хеш считается и для неизвестного e-mail, чтобы время ответа
+            # не выдавало существование пользователя.
+            await self.password_helper.hash_async(credentials.password)
+            return None
+        verified, updated_password_hash = (
+            await self.password_helper.verify_and_update_async(
+                credentials.password, user.hashed_password))
+        if not verified:
+            return None
+        if updated_password_hash is not None:
+            await self.user_db.update(
+                user, {'hashed_password': updated_password_hash})
+        return user
+
+    async def _update(self, user: User, update_dict: Dict[str, Any]) -> User:
+        if 'password' in update_dict:
+            update_dict = dict(update_dict)
+            password = update_dict.pop('password')
+            await self.validate_password(password, user)
+            # Готовый хеш fastapi-users сохраняет как обычное поле.
+            update_dict['hashed_password'] = (
+                await self.password_helper.hash_async(password))
+        return await super()._update(user, update_dict)
 
     async def validate_password(
         self,
@@ -52,9 +240,29 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
     ):
         print(f'Пользователь {user.email} зарегистрирован.')
 
+    async def on_after_update(
+        self,
+        user: User,
+        update_dict: Dict[str, Any],
+        request: Optional[Request] = None,
+    ):
+        user_cache.invalidate(user.id)
+        token_revocation.revoke(user.id)
+
+    async def on_after_verify(
+        self, user: User, request: Optional[Request] = None
+    ):
+        user_cache.invalidate(user.id)
+
+    async def on_after_reset_password(
+        self, user: User, request: Optional[Request] = None
+    ):
+        user_cache.invalidate(user.id)
+        token_revocation.revoke(user.id)
+
 
 async def get_user_manager(user_db=Depends(get_user_db)):
-    yield UserManager(user_db)
+    yield UserManager(user_db, password_helper)
 
 
 fastapi_users = FastAPIUsers[User, int](
@@ -63,5 +271,26 @@ fastapi_users = FastAPIUsers[User, int](
 )
 
 
+async def current_superuser_from_claims(
+    token: Optional[str] = Depends(bearer_transport.scheme),
+    user_manager: UserManager = Depends(get_user_manager),
+) -> User:
+    """Проверяет права суперпользователя по утверждениям токена.
+
+    Токены без утверждений и отозванные токены проверяются по БД.
+    """
+    strategy = get_jwt_strategy()
+    user = strategy.read_claims(token)
+    if user is None:
+        user = await strategy.read_token(token, user_manager)
+    if user is None or not user.is_active:
+        raise HTTPException(status_code=HTTPStatus.UNAUTHORIZED)
+    if not user.is_superuser:
+        raise HTTPException(status_code=HTTPStatus.FORBIDDEN)
+    return user
+
+
 current_user = fastapi_users.current_user(active=True)
-current_superuser = fastapi_users.current_user(active=True, superuser=True)
+current_superuser = (
+    current_superuser_from_claims if settings.superuser_claims
+    else fastapi_users.current_user(active=True, superuser=True))
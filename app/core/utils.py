@@ -1,9 +1,139 @@
 from datetime import datetime as dt
-from typing import List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
 
+import numpy as np
+from sqlalchemy import (DateTime, and_, bindparam, false, insert, or_, select,
+                        text, update)
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.sql import Executable
 
 from app import models
+from app.core.cache import project_list_cache
+from app.core.config import settings
+from app.core.summary import update_summary
+from app.models.fund_summary import SUMMARY_ID
+
+POSTGRESQL = 'postgresql'
+SQL_ENGINE = 'sql'
+# Ключ транзакционной advisory-блокировки распределения в PostgreSQL.
+ALLOCATION_LOCK_ID = 7240511
+ALLOCATION_LOCK_SQL = text('SELECT pg_advisory_xact_lock(:lock_id)')
+OPEN_QUEUE_SQL = """
+    SELECT id,
+           full_amount - invested_amount AS balance,
+           SUM(full_amount - invested_amount)
+               OVER (ORDER BY create_date, id) AS cumulative
+    FROM {table}
+    WHERE fully_invested = false
+"""
+INVEST_QUEUE_SQL = """
+    UPDATE {table}
+    SET invested_amount = {table}.invested_amount
+            + LEAST(queue.cumulative, total.amount)
+            - (queue.cumulative - queue.balance),
+        fully_invested = queue.cumulative <= total.amount,
+        version = {table}.version + 1,
+        close_date = CASE WHEN queue.cumulative <= total.amount
+                          THEN :now ELSE {table}.close_date END
+    FROM {queue} AS queue, total
+    WHERE {table}.id = queue.id
+      AND NOT {table}.fully_invested
+      AND queue.cumulative - queue.balance < total.amount
+    RETURNING {table}.id, {table}.invested_amount,
+              {table}.fully_invested, {table}.close_date
+"""
+CALCULATE_INVESTMENTS_SQL = text(f"""
+WITH projects AS ({OPEN_QUEUE_SQL.format(
+    table=models.CharityProject.__tablename__)}),
+donations AS ({OPEN_QUEUE_SQL.format(
+    table=models.Donation.__tablename__)}),
+total AS (
+    SELECT LEAST(
+        (SELECT COALESCE(SUM(balance), 0) FROM projects),
+        (SELECT COALESCE(SUM(balance), 0) FROM donations)
+    ) AS amount
+),
+investments AS (
+    INSERT INTO {models.Investment.__tablename__}
+        (donation_id, project_id, amount, create_date)
+    SELECT donations.id,
+           projects.id,
+           LEAST(projects.cumulative, donations.cumulative, total.amount)
+               - GREATEST(projects.cumulative - projects.balance,
+                          donations.cumulative - donations.balance),
+           :now
+    FROM projects
+    JOIN donations
+      ON projects.cumulative - projects.balance < donations.cumulative
+     AND donations.cumulative - donations.balance < projects.cumulative
+    CROSS JOIN total
+    WHERE GREATEST(projects.cumulative - projects.balance,
+                   donations.cumulative - donations.balance) < total.amount
+),
+invested_projects AS ({INVEST_QUEUE_SQL.format(
+    table=models.CharityProject.__tablename__, queue='projects')}),
+invested_donations AS ({INVEST_QUEUE_SQL.format(
+    table=models.Donation.__tablename__, queue='donations')}),
+closed_count AS (
+    SELECT COUNT(*) AS amount FROM invested_projects WHERE fully_invested
+),
+summary AS (
+    UPDATE {models.FundSummary.__tablename__} AS summary
+    SET total_invested = summary.total_invested + total.amount,
+        open_projects = summary.open_projects - closed_count.amount,
+        closed_projects = summary.closed_projects + closed_count.amount
+    FROM total, closed_count
+    WHERE summary.id = {SUMMARY_ID}
+)
+SELECT '{models.CharityProject.__tablename__}' AS model, *
+FROM invested_projects
+UNION ALL
+SELECT '{models.Donation.__tablename__}', *
+FROM invested_donations
+""").bindparams(bindparam('now', type_=DateTime))
+ALLOCATED_FIELDS = ('invested_amount', 'fully_invested', 'close_date')
+
+ObjectKey = Tuple[str, int]
+
+
+class AllocationRecord:
+    """Открытый проект или пожертвование в цикле распределения.
+
+    Вместо ORM-объекта хранит только поля, нужные для расчёта.
+    """
+    __slots__ = (
+        'id',
+        'full_amount',
+        'invested_amount',
+        'create_date',
+        'fully_invested',
+        'close_date',
+        'initial_invested_amount',
+    )
+
+    def __init__(
+        self,
+        id: int,
+        full_amount: int,
+        invested_amount: int,
+        create_date: dt,
+    ) -> None:
+        self.id = id
+        self.full_amount = full_amount
+        self.invested_amount = invested_amount
+        self.create_date = create_date
+        self.fully_invested = False
+        self.close_date = None
+        self.initial_invested_amount = invested_amount
+
+    @property
+    def is_changed(self) -> bool:
+        return (
+            self.fully_invested or
+            self.invested_amount != self.initial_invested_amount
+        )
 
 
 def __get_balance(
@@ -31,6 +161,192 @@ def __calc(
     __close_object(less)
 
 
+def __distribute(
+    projects: List[models.CharityProject],
+    donations: List[models.Donation],
+) -> List[Dict[str, int]]:
+
+    transfers = []
+    project_id, donation_id = 0, 0
+    while project_id < len(projects) and donation_id < len(donations):
+        project_balance = __get_balance(projects[project_id])
+        donation_balance = __get_balance(donations[donation_id])
+        if min(project_balance, donation_balance):
+            transfers.append({
+                'donation_id': donations[donation_id].id,
+                'project_id': projects[project_id].id,
+                'amount': min(project_balance, donation_balance),
+            })
+        if donation_balance < project_balance:
+            __calc(donations[donation_id], projects[project_id])
+            donation_id += 1
+        elif project_balance < donation_balance:
+            __calc(projects[project_id], donations[donation_id])
+            project_id += 1
+        else:
+            __close_object(donations[donation_id])
+            donation_id += 1
+            __close_object(projects[project_id])
+            project_id += 1
+    return transfers
+
+
+async def __execute_in_batches(
+    session: AsyncSession,
+    query: Executable,
+    params: List[Dict],
+) -> None:
+
+    batch_size = settings.allocation_bulk_batch_size
+    for start in range(0, len(params), batch_size):
+        await session.execute(query, params[start:start + batch_size])
+
+
+async def __record_investments(
+    session: AsyncSession,
+    transfers: List[Dict[str, int]],
+    closed_projects: int,
+) -> None:
+    """Записывает переводы в журнал и их итог в итоги фонда."""
+    await __execute_in_batches(
+        session, insert(models.Investment), transfers)
+    await update_summary(
+        session,
+        invested=sum(transfer['amount'] for transfer in transfers),
+        closed=closed_projects,
+    )
+
+
+def __get_bulk_update_query(
+    model: Type[Union[models.CharityProject, models.Donation]],
+) -> Executable:
+
+    table = model.__table__
+    return update(table).where(table.c.id == bindparam('obj_id')).values(
+        invested_amount=bindparam('obj_invested_amount'),
+        fully_invested=bindparam('obj_fully_invested'),
+        close_date=bindparam('obj_close_date'),
+    )
+
+
+async def __write_back(
+    session: AsyncSession,
+    model: Type[Union[models.CharityProject, models.Donation]],
+    records: List[AllocationRecord],
+) -> None:
+
+    await __execute_in_batches(
+        session,
+        __get_bulk_update_query(model),
+        [{
+            'obj_id': record.id,
+            'obj_invested_amount': record.invested_amount,
+            'obj_fully_invested': record.fully_invested,
+            'obj_close_date': record.close_date,
+        } for record in records if record.is_changed],
+    )
+
+
+async def __get_open_records(
+    session: AsyncSession,
+    model: Type[Union[models.CharityProject, models.Donation]],
+    limit: Optional[int] = None,
+    skip_locked: bool = False,
+    after: Optional[AllocationRecord] = None,
+) -> List[AllocationRecord]:
+
+    query = (
+        select(
+            model.id,
+            model.full_amount,
+            model.invested_amount,
+            model.create_date,
+        )
+        .where(model.fully_invested == false())
+        .order_by(model.create_date, model.id)
+        .limit(limit))
+    if after is not None:
+        query = query.where(or_(
+            model.create_date > after.create_date,
+            and_(
+                model.create_date == after.create_date,
+                model.id > after.id,
+            ),
+        ))
+    if skip_locked:
+        query = query.with_for_update(skip_locked=True)
+    rows = await session.execute(query)
+    return [AllocationRecord(*row) for row in rows]
+
+
+async def __invest_incrementally(
+    session: AsyncSession,
+    model: Type[Union[models.CharityProject, models.Donation]],
+    pk: int,
+    chunk_size: int,
+    obj: Optional[Union[models.CharityProject, models.Donation]] = None,
+) -> Tuple[Optional[AllocationRecord], List[Dict[str, int]], int]:
+    """Распределяет баланс нового объекта по встречной FIFO-очереди.
+
+    Очередь читается порциями по `chunk_size` строк в порядке `create_date`,
+    чтение прекращается, как только баланс объекта исчерпан. Изменённые
+    строки записываются обратно одним executemany на таблицу. Возвращает
+    итоговое состояние объекта, список переводов и число закрытых проектов.
+
+    Если передан актуальный объект `obj`, его поля берутся без запроса
+    к БД, иначе объект читается по `pk`.
+    """
+    if obj is not None:
+        record = None if obj.fully_invested else AllocationRecord(
+            obj.id, obj.full_amount, obj.invested_amount, obj.create_date)
+    else:
+        row = (await session.execute(
+            select(
+                model.id,
+                model.full_amount,
+                model.invested_amount,
+                model.create_date,
+            ).where(model.id == pk, model.fully_invested == false())
+        )).first()
+        record = None if row is None else AllocationRecord(*row)
+    if record is None:
+        return None, [], 0
+    is_project = model is models.CharityProject
+    opposite = models.Donation if is_project else models.CharityProject
+    transfers, touched, last = [], [], None
+    while not record.fully_invested and __get_balance(record) > 0:
+        chunk = await __get_open_records(
+            session, opposite, chunk_size, after=last)
+        if not chunk:
+            break
+        if is_project:
+            transfers += __distribute([record], chunk)
+        else:
+            transfers += __distribute(chunk, [record])
+        touched += chunk
+        last = chunk[-1]
+        if len(chunk) < chunk_size:
+            break
+    await __write_back(session, model, [record])
+    await __write_back(session, opposite, touched)
+    projects = [record] if is_project else touched
+    return record, transfers, sum(
+        project.fully_invested for project in projects)
+
+
+async def __invest_records(
+    session: AsyncSession,
+    projects: List[AllocationRecord],
+    donations: List[AllocationRecord],
+) -> None:
+
+    transfers = __distribute(projects, donations)
+    await __write_back(session, models.CharityProject, projects)
+    await __write_back(session, models.Donation, donations)
+    await __record_investments(session, transfers, sum(
+        project.fully_invested for project in projects))
+
+
 async def calculate_investments(
     session: AsyncSession,
     projects: Union[List[models.CharityProject], models.CharityProject],
@@ -38,24 +354,215 @@ async def calculate_investments(
 ) -> None:
 
     if projects and donations:
-        project_id, donation_id = 0, 0
-        while project_id < len(projects) and donation_id < len(donations):
-            project_balance = __get_balance(projects[project_id])
-            donation_balance = __get_balance(donations[donation_id])
-            if donation_balance < project_balance:
-                __calc(donations[donation_id], projects[project_id])
-                donation_id += 1
-            elif project_balance < donation_balance:
-                __calc(projects[project_id], donations[donation_id])
-                project_id += 1
-            else:
-                __close_object(donations[donation_id])
-                donation_id += 1
-                __close_object(projects[project_id])
-                project_id += 1
+        closed_before = sum(project.fully_invested for project in projects)
+        transfers = __distribute(projects, donations)
+        await __record_investments(session, transfers, sum(
+            project.fully_invested for project in projects) - closed_before)
         await session.commit()
+        project_list_cache.invalidate()
 
     elif isinstance(projects, models.CharityProject):
-        if projects.invested_amount == projects.full_amount:
+        # Распределение могло изменить сумму после загрузки проекта,
+        # поэтому она перечитывается под блокировкой строки.
+        await session.refresh(
+            projects, ['invested_amount', 'fully_invested'],
+            with_for_update=True)
+        if (
+            not projects.fully_invested and
+            projects.invested_amount == projects.full_amount
+        ):
             __close_object(projects)
-            await session.commit()
\ No newline at end of file
+            await update_summary(session, closed=1)
+            await session.commit()
+            project_list_cache.invalidate()
+
+
+async def calculate_investments_sql(session: AsyncSession) -> List[Row]:
+    """Распределяет все открытые пожертвования одним запросом к PostgreSQL.
+
+    Нарастающие суммы остатков (`SUM() OVER (ORDER BY create_date)`)
+    по обеим очередям сравниваются с общей распределяемой суммой, после чего
+    проекты и пожертвования обновляются двумя `UPDATE ... FROM` в одном
+    выражении. Пересечения нарастающих сумм дают записи журнала
+    инвестиций. Результат совпадает с результатом `calculate_investments`.
+    Возвращает новое состояние изменённых строк из `UPDATE ... RETURNING`.
+
+    Выражение читает очереди без блокировок строк, поэтому распределения
+    сериализуются advisory-блокировкой до конца транзакции: следующее
+    распределение видит результат предыдущего, а не тот же снимок.
+    """
+    await session.execute(ALLOCATION_LOCK_SQL, {'lock_id': ALLOCATION_LOCK_ID})
+    return (await session.execute(
+        CALCULATE_INVESTMENTS_SQL, {'now': dt.now()})).all()
+
+
+async def __load_open_columns(
+    session: AsyncSession,
+    model: Type[Union[models.CharityProject, models.Donation]],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+
+    rows = (await session.execute(
+        select(model.id, model.full_amount, model.invested_amount)
+        .where(model.fully_invested == false())
+        .order_by(model.create_date, model.id)
+    )).all()
+    columns = np.array(rows, dtype=np.int64).reshape(-1, 3)
+    return columns[:, 0], columns[:, 1], columns[:, 2]
+
+
+async def calculate_investments_bulk(session: AsyncSession) -> None:
+    """Векторизованно распределяет все открытые пожертвования.
+
+    Предназначена для импорта и восстановления состояния на миллионах строк:
+    столбцы сумм загружаются в массивы NumPy, FIFO-слияние двух очередей
+    вычисляется нарастающими суммами и `searchsorted`, а результат
+    записывается пачками UPDATE. Результат совпадает с результатом
+    `calculate_investments`.
+    """
+    queues = []
+    for model in (models.CharityProject, models.Donation):
+        ids, full, invested = await __load_open_columns(session, model)
+        queues.append((model, ids, full, invested, np.cumsum(full - invested)))
+    (_, project_ids, *_, project_cumulative), (
+        _, donation_ids, *_, donation_cumulative) = queues
+    if not (project_ids.size and donation_ids.size):
+        return
+    total = min(project_cumulative[-1], donation_cumulative[-1])
+    close_date = dt.now()
+    for model, ids, full, invested, cumulative in queues:
+        start = cumulative - (full - invested)
+        touched = start < total
+        await __execute_in_batches(
+            session,
+            __get_bulk_update_query(model),
+            [{
+                'obj_id': obj_id,
+                'obj_invested_amount': obj_invested_amount,
+                'obj_fully_invested': obj_fully_invested,
+                'obj_close_date': close_date if obj_fully_invested else None,
+            } for obj_id, obj_invested_amount, obj_fully_invested in zip(
+                ids[touched].tolist(),
+                (invested + np.minimum(cumulative, total) - start)[
+                    touched].tolist(),
+                (cumulative <= total)[touched].tolist(),
+            )],
+        )
+    # Каждый отрезок между соседними границами нарастающих сумм
+    # соответствует одному переводу из пожертвования в проект.
+    ends = np.union1d(project_cumulative, donation_cumulative)
+    ends = ends[ends <= total]
+    starts = np.concatenate(([0], ends[:-1]))
+    transferred = ends > starts
+    starts, amounts = starts[transferred], (ends - starts)[transferred]
+    transfers = [{
+        'donation_id': donation_id,
+        'project_id': project_id,
+        'amount': amount,
+    } for donation_id, project_id, amount in zip(
+        donation_ids[np.searchsorted(
+            donation_cumulative, starts, side='right')].tolist(),
+        project_ids[np.searchsorted(
+            project_cumulative, starts, side='right')].tolist(),
+        amounts.tolist(),
+    )]
+    await __record_investments(
+        session, transfers, int((project_cumulative <= total).sum()))
+    await session.commit()
+    project_list_cache.invalidate()
+
+
+def __apply_allocation(
+    objs: List[Union[models.CharityProject, models.Donation]],
+    keys: List[ObjectKey],
+    allocated: Dict[ObjectKey, Any],
+) -> None:
+    """Переносит результат распределения в ORM-объекты без SELECT."""
+    for obj, key in zip(objs, keys):
+        if key in allocated:
+            for field in ALLOCATED_FIELDS:
+                set_committed_value(obj, field, getattr(allocated[key], field))
+
+
+async def invest_batch(
+    session: AsyncSession,
+    objs: List[Union[models.CharityProject, models.Donation]],
+) -> None:
+    """Инвестирует пачку новых проектов и пожертвований.
+
+    Все объекты распределяются за один проход и фиксируются одним коммитом.
+    При `settings.allocation_engine == 'sql'` на PostgreSQL распределение
+    выполняется в базе данных одним запросом. В инкрементальном режиме
+    (`settings.allocation_incremental`) читаются лишь те строки встречной
+    очереди, которые действительно участвуют в распределении; иначе в расчёт
+    берутся все открытые объекты.
+
+    Новое состояние `invested_amount`, `fully_invested` и `close_date`
+    записывается в переданные объекты, поэтому перечитывать их после
+    коммита не нужно.
+    """
+    keys = [(obj.__tablename__, obj.id) for obj in objs]
+    if (
+        settings.allocation_engine == SQL_ENGINE and
+        session.bind.dialect.name == POSTGRESQL
+    ):
+        allocated = {
+            (row.model, row.id): row
+            for row in await calculate_investments_sql(session)}
+    elif settings.allocation_incremental:
+        allocated, transfers, closed_projects = {}, [], 0
+        # В пачке координатора распределение одного объекта меняет баланс
+        # следующих, поэтому они перечитываются из БД. Единственный объект
+        # только что сохранён и актуален.
+        single = objs[0] if len(objs) == 1 else None
+        for obj, key in zip(objs, keys):
+            record, obj_transfers, obj_closed = await __invest_incrementally(
+                session, type(obj), obj.id, settings.allocation_chunk_size,
+                single)
+            if record is not None:
+                allocated[key] = record
+            transfers += obj_transfers
+            closed_projects += obj_closed
+        await __record_investments(session, transfers, closed_projects)
+    else:
+        projects = await __get_open_records(session, models.CharityProject)
+        donations = await __get_open_records(session, models.Donation)
+        await __invest_records(session, projects, donations)
+        allocated = {
+            (model.__tablename__, record.id): record
+            for model, records in (
+                (models.CharityProject, projects),
+                (models.Donation, donations),
+            ) for record in records}
+    await session.commit()
+    project_list_cache.invalidate()
+    __apply_allocation(objs, keys, allocated)
+
+
+async def invest_pending(session: AsyncSession, limit: int) -> bool:
+    """Распределяет очередную пачку открытых проектов и пожертвований.
+
+    Используется фоновым распределением: на PostgreSQL строки пачки
+    блокируются `SELECT ... FOR UPDATE SKIP LOCKED`, поэтому несколько
+    обработчиков не мешают друг другу. Возвращает False, если распределять
+    нечего.
+    """
+    skip_locked = session.bind.dialect.name == POSTGRESQL
+    projects = await __get_open_records(
+        session, models.CharityProject, limit, skip_locked)
+    donations = await __get_open_records(
+        session, models.Donation, limit, skip_locked)
+    if not (projects and donations):
+        await session.rollback()
+        return False
+    await __invest_records(session, projects, donations)
+    await session.commit()
+    project_list_cache.invalidate()
+    return True
+
+
+async def invest(
+    session: AsyncSession,
+    obj: Union[models.CharityProject, models.Donation],
+) -> None:
+    """Инвестирует только что созданный проект или пожертвование."""
+    await invest_batch(session, [obj])
@@ -1,13 +1,20 @@
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime as dt
 from http import HTTPStatus
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar
+from typing import (Any, AsyncGenerator, Awaitable, Callable, Dict, Generic,
+                    List, Optional, Sequence, Tuple, Type, TypeVar)
 
 from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy import exc, select
+from sqlalchemy import and_, exc, func, or_, select
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core import Base
+from app.core import Base, refresh_expired
 from app.models import User
 
 ModelType = TypeVar('ModelType', bound=Base)
@@ -17,6 +24,7 @@ UpdateSchemaType = TypeVar('UpdateSchemaType', bound=BaseModel)
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     OBJECT_ALREADY_EXISTS = 'Object with such a unique values already exists'
+    INVALID_CURSOR = 'Invalid pagination cursor'
 
     def __init__(self, model: Type[ModelType]) -> None:
         self.model = model
@@ -30,16 +38,34 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def is_delete_allowed(self, obj: ModelType) -> None:
         raise NotImplementedError('is_delete_allowed()` must be implemented.')
 
-    async def __save(self, session: AsyncSession, obj: ModelType) -> ModelType:
+    async def on_create(self, session: AsyncSession, obj: ModelType) -> None:
+        """Called after the INSERT of obj is flushed, before the commit."""
+
+    async def on_delete(self, session: AsyncSession, obj: ModelType) -> None:
+        """Called after the DELETE of obj is flushed, before the commit."""
+
+    def on_commit(self) -> None:
+        """Called after every committed create, update and delete."""
+
+    async def __write(
+        self,
+        session: AsyncSession,
+        obj: ModelType,
+        write: Callable[[], Awaitable[None]],
+    ) -> None:
         session.add(obj)
         try:
-            await session.commit()
+            await write()
         except exc.IntegrityError:
-            session.rollback()
+            await session.rollback()
             raise HTTPException(
                 HTTPStatus.BAD_REQUEST,
                 self.OBJECT_ALREADY_EXISTS)
-        await session.refresh(obj)
+
+    async def __save(self, session: AsyncSession, obj: ModelType) -> ModelType:
+        await self.__write(session, obj, session.commit)
+        self.on_commit()
+        await refresh_expired(session, obj)
         return obj
 
     async def __get_by_attribute(
@@ -86,10 +112,88 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             raise HTTPException(HTTPStatus.NOT_FOUND, msg)
         return obj
 
+    async def get_etag(
+        self,
+        session: AsyncSession,
+        attr_name: Optional[str] = None,
+        attr_value: Any = None,
+    ) -> str:
+        """Weak ETag of the table without loading its rows.
+
+        The row count, the latest id and create_date and the sum of row
+        versions change with every insert, update and delete.
+        """
+        query = select(
+            func.count(self.model.id),
+            func.max(self.model.id),
+            func.max(self.model.create_date),
+            func.sum(self.model.version),
+        )
+        if attr_name is not None:
+            query = query.where(getattr(self.model, attr_name) == attr_value)
+        version = tuple((await session.execute(query)).one())
+        return 'W/"{}"'.format(
+            hashlib.sha1(repr(version).encode()).hexdigest())
+
     async def get_all(self, session: AsyncSession) -> List[ModelType]:
         objs = await session.scalars(select(self.model))
         return objs.all()
 
+    @staticmethod
+    def __encode_cursor(obj: ModelType) -> str:
+        return base64.urlsafe_b64encode(json.dumps(
+            [obj.create_date.isoformat(), obj.id]).encode()).decode()
+
+    def __decode_cursor(self, cursor: str) -> Tuple[dt, int]:
+        try:
+            create_date, pk = json.loads(base64.urlsafe_b64decode(cursor))
+            return dt.fromisoformat(create_date), int(pk)
+        except (binascii.Error, TypeError, ValueError):
+            raise HTTPException(HTTPStatus.BAD_REQUEST, self.INVALID_CURSOR)
+
+    async def get_page(
+        self,
+        session: AsyncSession,
+        limit: int,
+        after: Optional[str] = None,
+        attr_name: Optional[str] = None,
+        attr_value: Any = None,
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """Keyset pagination over (create_date, id).
+
+        Returns the page and the opaque cursor of the next one
+        (None for the last page).
+        """
+        query = select(self.model).order_by(
+            self.model.create_date, self.model.id).limit(limit + 1)
+        if attr_name is not None:
+            query = query.where(getattr(self.model, attr_name) == attr_value)
+        if after is not None:
+            create_date, pk = self.__decode_cursor(after)
+            query = query.where(or_(
+                self.model.create_date > create_date,
+                and_(self.model.create_date == create_date,
+                     self.model.id > pk),
+            ))
+        objs = (await session.scalars(query)).all()
+        if len(objs) <= limit:
+            return objs, None
+        return objs[:limit], self.__encode_cursor(objs[limit - 1])
+
+    async def stream_columns(
+        self,
+        session: AsyncSession,
+        fields: Sequence[str],
+        batch_size: int,
+    ) -> AsyncGenerator[List[Row], None]:
+        """Streams the table through a server-side cursor in batches."""
+        result = await session.stream(
+            select(*(getattr(self.model, field) for field in fields))
+            .order_by(self.model.id)
+            .execution_options(yield_per=batch_size))
+        async for rows in result.partitions(batch_size):
+            yield rows
+
     async def create(
         self,
         session: AsyncSession,
@@ -99,7 +203,12 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         create_data = payload.dict()
         if user is not None:
             create_data['user_id'] = user.id
-        return await self.__save(session, self.model(**create_data))
+        obj = self.model(**create_data)
+        # The hooks run after the row itself is written, so that the
+        # fundsummary row is locked last, in the same order as allocation.
+        await self.__write(session, obj, session.flush)
+        await self.on_create(session, obj)
+        return await self.__save(session, obj)
 
     async def update(
         self,
@@ -130,5 +239,8 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         self.has_permission(obj, user)
         self.is_delete_allowed(obj)
         await session.delete(obj)
+        await session.flush()
+        await self.on_delete(session, obj)
         await session.commit()
+        self.on_commit()
         return obj
\ No newline at end of file
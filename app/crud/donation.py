@@ -1,8 +1,11 @@
+from datetime import datetime as dt
 from typing import List, Optional
 
+from sqlalchemy import false, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas
+from app.core.summary import update_summary
 
 from .base import CRUDBase
 
@@ -12,6 +15,11 @@ class DonationCRUD(CRUDBase[
     schemas.DonationPayload,
     schemas.DonationPayload,
 ]):
+    async def on_create(
+        self, session: AsyncSession, obj: models.Donation
+    ) -> None:
+        await update_summary(session, raised=obj.full_amount)
+
     async def get_user_donations(
         self, session: AsyncSession, user: models.User
     ) -> Optional[List[models.Donation]]:
@@ -22,5 +30,21 @@ class DonationCRUD(CRUDBase[
     ) -> Optional[List[models.Donation]]:
         return await self.get_all_by_attr(session, 'fully_invested', False)
 
+    async def get_allocation_status(
+        self, session: AsyncSession
+    ) -> schemas.AllocationStatus:
+        queue_depth, oldest = (await session.execute(
+            select(
+                func.count(self.model.id),
+                func.min(self.model.create_date),
+            ).where(self.model.fully_invested == false())
+        )).one()
+        return schemas.AllocationStatus(
+            queue_depth=queue_depth,
+            oldest_unallocated=oldest,
+            lag_seconds=(
+                (dt.now() - oldest).total_seconds() if oldest else 0),
+        )
+
 
 donation_crud = DonationCRUD(models.Donation)
@@ -2,23 +2,61 @@
 Endpoints for the following operations:
   * upload_spreadsheet - creates the speadsheet, fills it with data and
                          returns the full path to the created spreadsheet;
-  * get_all_spreadsheets - returns the list of dictionaries with
+  * get_all_spreadsheets - streams the JSON list of dictionaries with
                            the info of each spreadsheet on the disk;
   * delete_spreadsheet - allows to delete the desired spreadsheet;
   * clear_disk - allows to delete all the spreadsheets from the disk;
 """
-from typing import Dict, List
+import json
+from http import HTTPStatus
+from typing import (Any, AsyncGenerator, AsyncIterable, AsyncIterator, Dict,
+                    TypeVar)
 
-from aiogoogle import Aiogoogle
-from fastapi import APIRouter, Depends
+from aiogoogle import Aiogoogle, HTTPError
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core import current_superuser, get_async_session
+from app.core import current_superuser, get_read_session
 
 from .client import google_client
 
 router = APIRouter(prefix='/google', tags=['Google'])
 
+Item = TypeVar('Item')
+
+
+async def prefetch_first(items: AsyncIterator[Item]) -> AsyncIterator[Item]:
+    """Fetches the first item eagerly and returns an iterator over all.
+
+    Errors of the first request are raised here, before a streaming
+    response sends its status and headers.
+    """
+    try:
+        first = [await items.__anext__()]
+    except StopAsyncIteration:
+        first = []
+
+    async def replay() -> AsyncGenerator[Item, None]:
+        for item in first:
+            yield item
+        if first:
+            async for item in items:
+                yield item
+
+    return replay()
+
+
+async def stream_json_list(
+    items: AsyncIterable[Dict[str, Any]],
+) -> AsyncGenerator[str, None]:
+    """Serializes items into a JSON list as they arrive."""
+    separator = '['
+    async for item in items:
+        yield separator + json.dumps(item, ensure_ascii=False)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
 
 @router.post(
     '/',
@@ -27,7 +65,7 @@ router = APIRouter(prefix='/google', tags=['Google'])
     description=google_client.UPLOAD_DESCRIPTION,
 )
 async def upload_spreadsheet_api(
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_read_session),
     wrapper_services: Aiogoogle = Depends(google_client.get_google_service),
 ) -> str:
     return await google_client.upload(wrapper_services, session)
@@ -35,14 +73,24 @@ async def upload_spreadsheet_api(
 
 @router.get(
     '/',
+    response_class=StreamingResponse,
     dependencies=[Depends(current_superuser)],
     summary=google_client.GETALL_SUMMARY,
     description=google_client.GETALL_DESCRIPTION,
 )
 async def get_all_spreadsheets_api(
     wrapper_services: Aiogoogle = Depends(google_client.get_google_service)
-) -> List[Dict[str, str]]:
-    return await google_client.get_all_spreadsheets(wrapper_services)
+) -> StreamingResponse:
+    try:
+        spreadsheets = await prefetch_first(
+            google_client.get_all_spreadsheets(wrapper_services))
+    except HTTPError as error:
+        raise HTTPException(
+            HTTPStatus.BAD_GATEWAY,
+            f'Google Drive вернул ошибку: '
+            f'{google_client._describe_error(error)}')
+    return StreamingResponse(
+        stream_json_list(spreadsheets), media_type='application/json')
 
 
 @router.delete(
@@ -67,5 +115,5 @@ async def delete_spreadsheet_api(
 )
 async def clear_disk_api(
     wrapper_services: Aiogoogle = Depends(google_client.get_google_service)
-) -> str:
+) -> Dict[str, Any]:
     return await google_client.clear_disk(wrapper_services)
@@ -3,21 +3,39 @@ The below class is a base class for Google clients.
 It allows the following operations:
   * upload_spreadsheet - creates the speadsheet, fills it with data and
                          returns the full path to the created spreadsheet;
-  * get_all_spreadsheets - returns the list of dictionaries with
-                           the info of each spreadsheet on the disk;
+  * get_all_spreadsheets - yields the dictionaries with the info of each
+                           spreadsheet on the disk, fetching them
+                           page by page;
   * delete_spreadsheet - allows to delete the desired spreadsheet;
-  * clear_disk - allows to delete all the spreadsheets from the disk;
+  * clear_disk - allows to delete all the spreadsheets from the disk
+                 concurrently and reports the result for each of them;
 
-To customize the class please inherit it and override the two methods:
+All operations share one long-lived Aiogoogle client: its aiohttp session
+keeps connections to Google alive and its service account manager keeps
+the access token until shortly before it expires. Call `start()` and
+`stop()` from the application lifespan.
+
+Discovery documents of the Drive and Sheets APIs are cached in memory for
+`google_discovery_cache_ttl` seconds and, if `google_discovery_cache_path`
+is set, in a local JSON file that is loaded on startup.
+
+Report rows are written in chunks of `google_write_chunk_rows` rows as
+they are produced, into a sheet sized for the whole report.
+
+To customize the class please inherit it and override the three methods:
 ----------------------------------
-    async def _get_spreadsheet_create_body(
+    async def get_spreadsheet_row_count(
         self, session: Optional[AsyncSession] = None,
-    ):
+    ) -> int:
 ----------------------------------
-    async def _get_spreadsheet_update_body(
-        self, session: Optional[AsyncSession] = None,
+    async def get_spreadsheet_create_body(
+        self, row_count: int, session: Optional[AsyncSession] = None,
     ):
 ----------------------------------
+    def get_spreadsheet_rows(
+        self, row_count: int, session: Optional[AsyncSession] = None,
+    ) -> AsyncGenerator[List[str], None]:
+----------------------------------
 
 and at least following constants:
     UPLOAD_SUMMARY: str = 'must be implemented'
@@ -30,18 +48,175 @@ and at least following constants:
     CLEARDISK_DESCRIPTION: str = 'must be implemented'
 """
 
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import tempfile
+import time
 from datetime import datetime as dt
 from http import HTTPStatus
-from typing import AsyncGenerator, Dict, List, Optional
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 
 from aiogoogle import Aiogoogle, GoogleAPI, HTTPError
 from aiogoogle.auth.creds import ServiceAccountCreds
+from aiogoogle.sessions.aiohttp_session import AiohttpSession
+from aiohttp import ClientError, TCPConnector
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core import settings
 
 
+class SharedAiohttpSession(AiohttpSession):
+    """Aiogoogle session that outlives the `async with` blocks using it.
+
+    Aiogoogle opens and closes a session around every token exchange;
+    this one is closed only by `aclose()`.
+    """
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        await super().close()
+
+
+logger = logging.getLogger(__name__)
+
+DiscoveryKey = Tuple[str, str]
+
+
+class DiscoveryCache:
+    """Discovery documents by API name and version with a TTL.
+
+    Documents are kept with the wall-clock time they were fetched at, so
+    the TTL also applies to the ones loaded from the file.
+    """
+
+    def __init__(self, ttl: float, path: Optional[str] = None) -> None:
+        self.ttl = ttl
+        self.path = path
+        self.__documents: Dict[DiscoveryKey, Tuple[float, Dict[str, Any]]] = {}
+        self.__services: Dict[DiscoveryKey, GoogleAPI] = {}
+
+    def __is_fresh(self, fetched_at: float) -> bool:
+        return time.time() - fetched_at < self.ttl
+
+    @staticmethod
+    def __parse_entry(
+        entry: Any,
+    ) -> Optional[Tuple[DiscoveryKey, float, Dict[str, Any]]]:
+        try:
+            key = (str(entry['name']), str(entry['version']))
+            fetched_at = float(entry['fetched_at'])
+            document = entry['document']
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not isinstance(document, dict):
+            return None
+        return key, fetched_at, document
+
+    def load(self) -> int:
+        """Loads unexpired documents from the file, returns their number."""
+        if not self.ttl or not self.path:
+            return 0
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                entries = json.load(file)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError):
+            logger.warning(
+                'Cannot read discovery cache %s', self.path, exc_info=True)
+            return 0
+        if not isinstance(entries, list):
+            entries = [entries]
+        invalid = 0
+        for entry in entries:
+            parsed = self.__parse_entry(entry)
+            if parsed is None:
+                invalid += 1
+                continue
+            key, fetched_at, document = parsed
+            if self.__is_fresh(fetched_at):
+                self.__documents[key] = (fetched_at, document)
+                self.__services.pop(key, None)
+        if invalid:
+            logger.warning(
+                'Skipped %s malformed entries of discovery cache %s',
+                invalid, self.path)
+        return len(self.__documents)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Copy of the cached documents in the file format."""
+        return [
+            {
+                'name': name,
+                'version': version,
+                'fetched_at': fetched_at,
+                'document': document,
+            }
+            for (name, version), (fetched_at, document)
+            in self.__documents.items()
+        ]
+
+    def save(self, entries: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Writes the entries, by default the current ones, to the file.
+
+        Called in a worker thread with a copy made on the event loop, so
+        that documents added meanwhile do not change the dict being read.
+        """
+        if not self.path:
+            return
+        if entries is None:
+            entries = self.entries()
+        # The file is replaced atomically, so that concurrent writers and
+        # readers never see a partially written cache.
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            descriptor, temp_path = tempfile.mkstemp(
+                dir=directory, suffix='.tmp')
+        except OSError:
+            logger.warning(
+                'Cannot write discovery cache %s', self.path, exc_info=True)
+            return
+        try:
+            with open(descriptor, 'w', encoding='utf-8') as file:
+                json.dump(entries, file)
+            os.replace(temp_path, self.path)
+        except OSError:
+            logger.warning(
+                'Cannot write discovery cache %s', self.path, exc_info=True)
+            with contextlib.suppress(OSError):
+                os.unlink(temp_path)
+
+    async def discover(
+        self,
+        wrapper_services: Aiogoogle,
+        name: str,
+        version: str,
+    ) -> GoogleAPI:
+        key = (name, version)
+        cached = self.__documents.get(key)
+        if cached is not None and self.__is_fresh(cached[0]):
+            if key not in self.__services:
+                self.__services[key] = GoogleAPI(cached[1])
+            return self.__services[key]
+        document = await wrapper_services.as_anon(
+            wrapper_services.discovery_service.apis.getRest(
+                api=name, version=version, validate=False))
+        service = GoogleAPI(document)
+        if self.ttl:
+            self.__documents[key] = (time.time(), document)
+            self.__services[key] = service
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.save, self.entries())
+        return service
+
+
 class GoogleBaseClient:
     """Base class for Google client."""
     FORMAT = "%Y/%m/%d %H:%M:%S"
@@ -53,18 +228,7 @@ class GoogleBaseClient:
     SHEET_TYPE = 'GRID'
     SHEET_ID = 0
     SHEET_TITLE = 'Лист1'
-    SHEET_ROW_COUNT = 100
     SHEET_COLUMN_COUNT = 11
-    SHEETS_PROPERTIES = [{
-        'properties': {
-            'sheetType': SHEET_TYPE,
-            'sheetId': SHEET_ID,
-            'title': SHEET_TITLE,
-            'gridProperties': {
-                'rowCount': SHEET_ROW_COUNT,
-                'columnCount': SHEET_COLUMN_COUNT,
-            }}
-    }]
     SCOPES = [
         'https://www.googleapis.com/auth/spreadsheets',
         'https://www.googleapis.com/auth/drive',
@@ -83,9 +247,13 @@ class GoogleBaseClient:
         'scopes': SCOPES,
     }
     DIMENSIONS = 'ROWS'
-    RANGE = 'A1:E30'
     INPUT_OPTION = 'USER_ENTERED'
     PERMISSIONS_FIELDS = 'id'
+    FILES_QUERY = 'mimeType="application/vnd.google-apps.spreadsheet"'
+    FILES_FIELDS = 'nextPageToken, files(id, name)'
+    QUOTA_ERROR_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+    DELETED_STATUS = 'deleted'
+    FAILED_STATUS = 'failed'
     PERMISSIONS_BODY = {
         'type': 'user',
         'role': 'writer',
@@ -104,17 +272,36 @@ class GoogleBaseClient:
     def _get_datetime(self) -> str:
         return dt.now().strftime(self.FORMAT)
 
-    async def get_spreadsheet_create_body(
+    def _get_sheets_properties(self, row_count: int) -> List[Dict[str, Any]]:
+        return [{
+            'properties': {
+                'sheetType': self.SHEET_TYPE,
+                'sheetId': self.SHEET_ID,
+                'title': self.SHEET_TITLE,
+                'gridProperties': {
+                    'rowCount': max(row_count, 1),
+                    'columnCount': self.SHEET_COLUMN_COUNT,
+                }}
+        }]
+
+    async def get_spreadsheet_row_count(
         self, session: Optional[AsyncSession] = None,
-    ) -> Dict[str, str]:
+    ) -> int:
         raise NotImplementedError(
-            'method _get_spreadsheet_create_body()` must be implemented.')
+            'method get_spreadsheet_row_count()` must be implemented.')
 
-    async def get_spreadsheet_update_body(
-        self, session: Optional[AsyncSession] = None,
-    ) -> Dict[str, str]:
+    async def get_spreadsheet_create_body(
+        self, row_count: int, session: Optional[AsyncSession] = None,
+    ) -> Dict[str, Any]:
+        raise NotImplementedError(
+            'method get_spreadsheet_create_body()` must be implemented.')
+
+    def get_spreadsheet_rows(
+        self, row_count: int, session: Optional[AsyncSession] = None,
+    ) -> AsyncGenerator[List[str], None]:
+        """Yields at most `row_count` rows of the report."""
         raise NotImplementedError(
-            'method _get_spreadsheet_update_body()` must be implemented.')
+            'method get_spreadsheet_rows()` must be implemented.')
 
     async def _get_api_service(
         self,
@@ -122,15 +309,56 @@ class GoogleBaseClient:
         drive: bool = False,
     ) -> GoogleAPI:
         if drive:
-            return await wrapper_services.discover(
+            return await self.discovery_cache.discover(
+                wrapper_services,
                 self.DRIVE_API_NAME,
                 self.DRIVE_API_VERSION,
             )
-        return await wrapper_services.discover(
+        return await self.discovery_cache.discover(
+            wrapper_services,
             self.SHEETS_API_NAME,
             self.SHEETS_API_VERSION,
         )
 
+    def _is_quota_error(self, error: HTTPError) -> bool:
+        response = error.res
+        if response is None:
+            return False
+        if response.status_code == HTTPStatus.TOO_MANY_REQUESTS:
+            return True
+        if response.status_code != HTTPStatus.FORBIDDEN:
+            return False
+        body = response.json if isinstance(response.json, dict) else {}
+        return any(
+            reason.get('reason') in self.QUOTA_ERROR_REASONS
+            for reason in body.get('error', {}).get('errors', []))
+
+    def _describe_error(self, error: Exception) -> str:
+        response = getattr(error, 'res', None)
+        if response is None:
+            return str(error) or type(error).__name__
+        body = response.json if isinstance(response.json, dict) else {}
+        return body.get('error', {}).get('message') or (
+            f'HTTP {response.status_code}')
+
+    async def _send_with_retry(self, wrapper_services: Aiogoogle, request):
+        """Sends the request, retrying with backoff on quota errors.
+
+        The request is sent at least once, whatever the retry setting.
+        """
+        attempts = max(settings.google_retry_attempts, 1)
+        for attempt in range(1, attempts + 1):
+            try:
+                return await wrapper_services.as_service_account(request)
+            except HTTPError as error:
+                if (
+                    attempt == attempts or
+                    not self._is_quota_error(error)
+                ):
+                    raise
+                delay = settings.google_retry_base_delay * 2 ** (attempt - 1)
+                await asyncio.sleep(random.uniform(0, delay))
+
     async def set_user_permissions(
         self,
         wrapper_services: Aiogoogle,
@@ -147,31 +375,60 @@ class GoogleBaseClient:
     async def spreadsheets_create(
         self,
         wrapper_services: Aiogoogle,
+        row_count: int,
         session: Optional[AsyncSession] = None,
     ) -> str:
         service = await self._get_api_service(wrapper_services)
-        create_body = await self.get_spreadsheet_create_body(session)
+        create_body = await self.get_spreadsheet_create_body(
+            row_count, session)
         response = await wrapper_services.as_service_account(
             service.spreadsheets.create(
                 json=create_body,
             ))
         return response['spreadsheetId']
 
+    async def __write_rows(
+        self,
+        wrapper_services: Aiogoogle,
+        service: GoogleAPI,
+        spreadsheet_id: str,
+        first_row: int,
+        rows: List[List[str]],
+    ) -> None:
+        await self._send_with_retry(
+            wrapper_services,
+            service.spreadsheets.values.batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                json={
+                    'valueInputOption': self.INPUT_OPTION,
+                    'data': [{
+                        'range': f"'{self.SHEET_TITLE}'!A{first_row}",
+                        'majorDimension': self.DIMENSIONS,
+                        'values': rows,
+                    }],
+                },
+            ))
+
     async def spreadsheets_update(
         self,
         wrapper_services: Aiogoogle,
         spreadsheet_id: str,
+        row_count: int,
         session: Optional[AsyncSession] = None
     ) -> None:
+        """Writes the report rows in chunks as the generator yields them."""
         service = await self._get_api_service(wrapper_services)
-        update_body = await self.get_spreadsheet_update_body(session)
-        await wrapper_services.as_service_account(
-            service.spreadsheets.values.update(
-                spreadsheetId=spreadsheet_id,
-                range=self.RANGE,
-                valueInputOption=self.INPUT_OPTION,
-                json=update_body,
-            ))
+        first_row, chunk = 1, []
+        async for row in self.get_spreadsheet_rows(row_count, session):
+            chunk.append(row)
+            if len(chunk) == settings.google_write_chunk_rows:
+                await self.__write_rows(
+                    wrapper_services, service, spreadsheet_id,
+                    first_row, chunk)
+                first_row, chunk = first_row + len(chunk), []
+        if chunk:
+            await self.__write_rows(
+                wrapper_services, service, spreadsheet_id, first_row, chunk)
 
     def __check_info_vars(self):
         empty_vars = [key for key, value in self.INFO.items() if value is None or value == '']
@@ -187,26 +444,47 @@ class GoogleBaseClient:
         session: Optional[AsyncSession] = None,
     ) -> str:
         self.__check_info_vars()
+        row_count = await self.get_spreadsheet_row_count(session)
         spreadsheet_id = await self.spreadsheets_create(
-            wrapper_services, session)
+            wrapper_services, row_count, session)
         await self.set_user_permissions(
             wrapper_services, spreadsheet_id)
         await self.spreadsheets_update(
-            wrapper_services, spreadsheet_id, session)
+            wrapper_services, spreadsheet_id, row_count, session)
         return (
             f'Создан новый документ: '
             f'https://docs.google.com/spreadsheets/d/{spreadsheet_id} ')
 
-    async def get_all_spreadsheets(
+    def get_all_spreadsheets(
         self,
         wrapper_services: Aiogoogle,
-    ) -> List[Dict[str, str]]:
+    ) -> AsyncGenerator[Dict[str, str], None]:
+        """Checks the credentials and returns a generator of spreadsheets.
+
+        The check runs before the first page is requested, so that it can
+        still fail the request before a response starts streaming.
+        """
         self.__check_info_vars()
+        return self.__iter_spreadsheets(wrapper_services)
+
+    async def __iter_spreadsheets(
+        self,
+        wrapper_services: Aiogoogle,
+    ) -> AsyncGenerator[Dict[str, str], None]:
         service = await self._get_api_service(wrapper_services, drive=True)
-        response = await wrapper_services.as_service_account(
-            service.files.list(
-                q='mimeType="application/vnd.google-apps.spreadsheet"'))
-        return response['files']
+        params = {
+            'q': self.FILES_QUERY,
+            'fields': self.FILES_FIELDS,
+            'pageSize': settings.google_page_size,
+        }
+        while True:
+            response = await self._send_with_retry(
+                wrapper_services, service.files.list(**params))
+            for spreadsheet in response.get('files', []):
+                yield spreadsheet
+            if not response.get('nextPageToken'):
+                return
+            params['pageToken'] = response['nextPageToken']
 
     async def delete_spreadsheet(
         self,
@@ -216,33 +494,103 @@ class GoogleBaseClient:
         self.__check_info_vars()
         service = await self._get_api_service(wrapper_services, drive=True)
         try:
-            await wrapper_services.as_service_account(
-                service.files.delete(fileId=spreadsheet_id))
+            await self._send_with_retry(
+                wrapper_services, service.files.delete(fileId=spreadsheet_id))
         except HTTPError:
             raise HTTPException(
                 HTTPStatus.NOT_FOUND,
                 f'Документ с id = {spreadsheet_id} не найден.')
         return f'Документ с id = {spreadsheet_id} удален.'
 
+    async def __delete_file(
+        self,
+        wrapper_services: Aiogoogle,
+        service: GoogleAPI,
+        semaphore: asyncio.Semaphore,
+        spreadsheet: Dict[str, str],
+    ) -> Dict[str, str]:
+        result = {'id': spreadsheet['id'], 'name': spreadsheet.get('name')}
+        async with semaphore:
+            try:
+                await self._send_with_retry(
+                    wrapper_services,
+                    service.files.delete(fileId=spreadsheet['id']))
+            except (HTTPError, ClientError, asyncio.TimeoutError) as error:
+                # One failed deletion must not cancel the others in gather.
+                return {
+                    **result,
+                    'status': self.FAILED_STATUS,
+                    'error': self._describe_error(error),
+                }
+        return {**result, 'status': self.DELETED_STATUS}
+
     async def clear_disk(
         self,
         wrapper_services: Aiogoogle
-    ) -> str:
+    ) -> Dict[str, Any]:
         self.__check_info_vars()
-        spreadsheets = await self.get_all_spreadsheets(wrapper_services)
-        if spreadsheets:
-            for spreadsheet in spreadsheets:
-                await self.delete_spreadsheet(
-                    wrapper_services, spreadsheet['id'])
-            return 'Документы удалены, диск пуст.'
-        return 'На диске нет документов для удаления.'
+        # Deleting files while paging through them shifts the pages,
+        # so the whole list is collected first.
+        spreadsheets = [
+            spreadsheet async for spreadsheet
+            in self.get_all_spreadsheets(wrapper_services)]
+        if not spreadsheets:
+            return {
+                'detail': 'На диске нет документов для удаления.',
+                'deleted': 0,
+                'failed': 0,
+                'files': [],
+            }
+        service = await self._get_api_service(wrapper_services, drive=True)
+        semaphore = asyncio.Semaphore(settings.google_delete_concurrency)
+        results = await asyncio.gather(*(
+            self.__delete_file(
+                wrapper_services, service, semaphore, spreadsheet)
+            for spreadsheet in spreadsheets
+        ))
+        failed = sum(
+            result['status'] == self.FAILED_STATUS for result in results)
+        return {
+            'detail': (
+                f'Не удалось удалить документов: {failed}.' if failed
+                else 'Документы удалены, диск пуст.'),
+            'deleted': len(results) - failed,
+            'failed': failed,
+            'files': results,
+        }
 
     def __init__(self):
         self.cred = ServiceAccountCreds(**self.INFO)
+        self.__session: Optional[SharedAiohttpSession] = None
+        self.__aiogoogle: Optional[Aiogoogle] = None
+        self.discovery_cache = DiscoveryCache(
+            settings.google_discovery_cache_ttl,
+            settings.google_discovery_cache_path,
+        )
+
+    def __get_session(self) -> SharedAiohttpSession:
+        if self.__session is None or self.__session.closed:
+            self.__session = SharedAiohttpSession(connector=TCPConnector(
+                limit=settings.google_connection_limit,
+                keepalive_timeout=settings.google_keepalive_timeout,
+            ))
+        return self.__session
+
+    async def start(self) -> Aiogoogle:
+        if self.__aiogoogle is None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.discovery_cache.load)
+            self.__aiogoogle = Aiogoogle(
+                service_account_creds=self.cred,
+                session_factory=self.__get_session,
+            )
+        return self.__aiogoogle
+
+    async def stop(self) -> None:
+        if self.__session is not None:
+            await self.__session.aclose()
+        self.__session = None
+        self.__aiogoogle = None
 
     async def get_google_service(self) -> AsyncGenerator[Aiogoogle, None]:
-        async with Aiogoogle(
-            # service_account_creds=ServiceAccountCreds(**self.INFO)
-            service_account_creds=self.cred
-        ) as aiogoogle:
-            yield aiogoogle
\ No newline at end of file
+        yield await self.start()
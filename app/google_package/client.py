@@ -1,14 +1,18 @@
 """
-To customize the class please inherit it and override the two methods:
+To customize the class please inherit it and override the three methods:
 ----------------------------------
-    async def _get_spreadsheet_create_body(
+    async def get_spreadsheet_row_count(
         self, session: Optional[AsyncSession] = None,
-    ):
+    ) -> int:
 ----------------------------------
-    async def _get_spreadsheet_update_body(
-        self, session: Optional[AsyncSession] = None,
+    async def get_spreadsheet_create_body(
+        self, row_count: int, session: Optional[AsyncSession] = None,
     ):
 ----------------------------------
+    def get_spreadsheet_rows(
+        self, row_count: int, session: Optional[AsyncSession] = None,
+    ) -> AsyncGenerator[List[str], None]:
+----------------------------------
 
 and at least following constants:
     UPLOAD_SUMMARY: str = 'must be implemented'
@@ -20,7 +24,7 @@ and at least following constants:
     CLEARDISK_SUMMARY: str = 'must be implemented'
     CLEARDISK_DESCRIPTION: str = 'must be implemented'
 """
-from typing import Dict
+from typing import Any, AsyncGenerator, Dict, List
 
 from app.core import settings
 from app.crud import charity_crud
@@ -29,6 +33,7 @@ from .base import GoogleBaseClient
 
 
 class GoogleClient(GoogleBaseClient):
+    REPORT_FIELDS = ('name', 'create_date', 'close_date', 'description')
     UPLOAD_SUMMARY: str = 'Формирование отчёта в гугл-таблице.'
     UPLOAD_DESCRIPTION: str = (
         f'{settings.SUPER_ONLY}' +
@@ -50,36 +55,53 @@ class GoogleClient(GoogleBaseClient):
     CLEARDISK_SUMMARY: str = 'Очистка диска.'
     CLEARDISK_DESCRIPTION: str = (
         f'{settings.SUPER_ONLY}' +
-        '**__ВНИМАНИЕ: с диска будут удалены все таблицы!__**'
+        '**__ВНИМАНИЕ: с диска будут удалены все таблицы!__** '
+        'В ответе будет результат удаления каждой таблицы: ошибка удаления '
+        'одной из них не прерывает очистку диска.'
     )
 
-    async def get_spreadsheet_create_body(self, session) -> Dict[str, str]:
+    def _get_header_rows(self) -> List[List[str]]:
+        return [
+            ['Отчет от', self._get_datetime()],
+            ['Топ проектов по скорости закрытия'],
+            ['Название проекта', 'Время сбора', 'Описание'],
+        ]
+
+    async def get_spreadsheet_row_count(self, session) -> int:
+        return (
+            len(self._get_header_rows()) +
+            await charity_crud.count_closed_projects(session))
+
+    async def get_spreadsheet_create_body(
+        self, row_count, session
+    ) -> Dict[str, Any]:
         return {
             'properties': {
                 'title': f'Отчет от: {self._get_datetime()}',
                 'locale': self.LOCALE,
             },
-            'sheets': self.SHEETS_PROPERTIES,
+            'sheets': self._get_sheets_properties(row_count),
         }
 
-    async def get_spreadsheet_update_body(self, session) -> Dict[str, str]:
-        table = [
-            ['Отчет от', self._get_datetime()],
-            ['Топ проектов по скорости закрытия'],
-            ['Название проекта', 'Время сбора', 'Описание'],
-        ]
-        projects = await charity_crud.get_projects_by_completion_rate(session)
-        if projects:
+    async def get_spreadsheet_rows(
+        self, row_count, session
+    ) -> AsyncGenerator[List[str], None]:
+        header = self._get_header_rows()
+        for row in header:
+            yield row
+        # Проекты, закрытые после подсчёта строк, не поместятся в таблицу.
+        async for projects in charity_crud.stream_projects_by_completion_rate(
+            session,
+            self.REPORT_FIELDS,
+            settings.export_batch_size,
+            limit=row_count - len(header),
+        ):
             for project in projects:
-                table.append([
+                yield [
                     project.name,
                     str(project.close_date - project.create_date),
                     project.description,
-                ])
-        return {
-            'majorDimension': self.DIMENSIONS,
-            'values': table,
-        }
+                ]
 
 
 google_client = GoogleClient()
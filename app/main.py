@@ -1,8 +1,22 @@
-from fastapi import FastAPI
+import logging
+from http import HTTPStatus
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import exc
 
 from app.api.routers import main_router
+from app.core.allocation import (COORDINATOR_MODE, DEFERRED_MODE,
+                                 allocation_coordinator, deferred_allocator,
+                                 summary_reconciler)
 from app.core.config import settings
+from app.core.db import describe_pool, describe_pool_status, engine
 from app.core.init_db import create_admin
+from app.core.password import password_helper
+from app.google_package.client import google_client
+
+logging.basicConfig(level=settings.log_level)
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title=settings.app_title,
@@ -12,6 +26,35 @@ app = FastAPI(
 app.include_router(main_router)
 
 
+@app.exception_handler(exc.TimeoutError)
+async def pool_timeout_handler(request: Request, error: exc.TimeoutError):
+    logger.error(
+        'Нет свободных соединений с БД: %s', describe_pool_status())
+    return JSONResponse(
+        status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+        content={'detail': 'Сервис перегружен, повторите запрос позже'})
+
+
 @app.on_event('startup')
 async def startup():
-    await create_admin()
\ No newline at end of file
+    logger.info(
+        'БД %s: %s',
+        engine.url.render_as_string(hide_password=True),
+        describe_pool(engine))
+    await create_admin()
+    if settings.allocation_mode == COORDINATOR_MODE:
+        await allocation_coordinator.start()
+    if settings.allocation_mode == DEFERRED_MODE:
+        await deferred_allocator.start()
+    if settings.summary_reconcile_interval:
+        await summary_reconciler.start()
+    await google_client.start()
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    await allocation_coordinator.stop()
+    await deferred_allocator.stop()
+    await summary_reconciler.stop()
+    password_helper.shutdown()
+    await google_client.stop()
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, String, Text
+from sqlalchemy import Column, Index, String, Text
 
 from app.core import Base
-from app.models.mixins import CommonFieldsMixin
+from app.models.mixins import (CLOSED_PREDICATE, CommonFieldsMixin, Duration,
+                               open_queue_index, page_order_index)
 
 
 class CharityProject(CommonFieldsMixin, Base):
+    __table_args__ = (
+        open_queue_index('charityproject'),
+        page_order_index('charityproject'),
+    )
     name = Column(String(100), unique=True, nullable=False)
     description = Column(Text, nullable=False)
 
@@ -15,4 +20,13 @@ class CharityProject(CommonFieldsMixin, Base):
             f'invested_amount: {self.invested_amount}, \n'
             f'fully_invested: {self.fully_invested}, \n'
             f'close_date: {self.close_date}. \n\n'
-        )
\ No newline at end of file
+        )
+
+
+# Сортировка закрытых проектов по скорости сбора средств.
+Index(
+    'ix_charityproject_completion_time',
+    Duration(CharityProject.create_date, CharityProject.close_date),
+    CharityProject.id,
+    **CLOSED_PREDICATE,
+)
@@ -1,10 +1,16 @@
-from sqlalchemy import Column, ForeignKey, Integer, Text
+from sqlalchemy import Column, ForeignKey, Index, Integer, Text
 
 from app.core import Base
-from app.models.mixins import CommonFieldsMixin
+from app.models.mixins import (CommonFieldsMixin, open_queue_index,
+                               page_order_index)
 
 
 class Donation(CommonFieldsMixin, Base):
+    __table_args__ = (
+        open_queue_index('donation'),
+        page_order_index('donation'),
+        Index('ix_donation_user_id_create_date', 'user_id', 'create_date'),
+    )
     user_id = Column(Integer, ForeignKey('user.id'))
     comment = Column(Text)
 
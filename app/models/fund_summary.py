@@ -0,0 +1,32 @@
+from sqlalchemy import BigInteger, Column, Integer, event, insert
+
+from app.core import Base
+
+SUMMARY_ID = 1
+
+
+class FundSummary(Base):
+    """Итоги фонда: единственная строка, обновляемая приращениями."""
+    total_raised = Column(BigInteger, nullable=False, default=0)
+    total_invested = Column(BigInteger, nullable=False, default=0)
+    open_projects = Column(Integer, nullable=False, default=0)
+    closed_projects = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return (
+            f'total_raised: {self.total_raised}, \n'
+            f'total_invested: {self.total_invested}, \n'
+            f'open_projects: {self.open_projects}, \n'
+            f'closed_projects: {self.closed_projects}. \n\n'
+        )
+
+
+@event.listens_for(FundSummary.__table__, 'after_create')
+def create_summary_row(table, connection, **kw):
+    connection.execute(insert(table).values(
+        id=SUMMARY_ID,
+        total_raised=0,
+        total_invested=0,
+        open_projects=0,
+        closed_projects=0,
+    ))
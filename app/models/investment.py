@@ -0,0 +1,22 @@
+from datetime import datetime as dt
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer
+
+from app.core import Base
+
+
+class Investment(Base):
+    donation_id = Column(
+        Integer, ForeignKey('donation.id'), nullable=False, index=True)
+    project_id = Column(
+        Integer, ForeignKey('charityproject.id'), nullable=False, index=True)
+    amount = Column(Integer, nullable=False)
+    create_date = Column(DateTime, default=dt.now)
+
+    def __repr__(self) -> str:
+        return (
+            f'donation_id: {self.donation_id}, \n'
+            f'project_id: {self.project_id}, \n'
+            f'amount: {self.amount}, \n'
+            f'create_date: {self.create_date}. \n\n'
+        )
@@ -1,7 +1,54 @@
 from datetime import datetime as dt
 
-from sqlalchemy import Boolean, Column, DateTime, Integer
+from sqlalchemy import (Boolean, Column, DateTime, Index, Integer,
+                        literal_column, text)
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import declarative_mixin
+from sqlalchemy.sql.functions import FunctionElement
+
+OPEN_PREDICATE = {
+    'postgresql_where': text('NOT fully_invested'),
+    'sqlite_where': text('fully_invested = 0'),
+}
+CLOSED_PREDICATE = {
+    'postgresql_where': text('fully_invested'),
+    'sqlite_where': text('fully_invested = 1'),
+}
+
+
+def open_queue_index(table_name: str) -> Index:
+    """Частичный индекс FIFO-очереди открытых объектов."""
+    return Index(
+        f'ix_{table_name}_open', 'create_date', 'id', **OPEN_PREDICATE)
+
+
+def page_order_index(table_name: str) -> Index:
+    """Индекс keyset-пагинации по всем объектам в порядке создания."""
+    return Index(f'ix_{table_name}_create_date_id', 'create_date', 'id')
+
+
+class Duration(FunctionElement):
+    """Разность `end - start` двух DateTime, пригодная для ORDER BY.
+
+    SQLite хранит даты строками, поэтому там разность считается
+    в днях через `julianday`.
+    """
+    name = 'duration'
+    inherit_cache = True
+
+
+@compiles(Duration)
+def compile_duration(element, compiler, **kw):
+    start, end = element.clauses
+    return '({} - {})'.format(
+        compiler.process(end, **kw), compiler.process(start, **kw))
+
+
+@compiles(Duration, 'sqlite')
+def compile_sqlite_duration(element, compiler, **kw):
+    start, end = element.clauses
+    return '(julianday({}) - julianday({}))'.format(
+        compiler.process(end, **kw), compiler.process(start, **kw))
 
 
 @declarative_mixin
@@ -10,4 +57,9 @@ class CommonFieldsMixin:
     invested_amount = Column(Integer, default=0)
     fully_invested = Column(Boolean, default=False)
     create_date = Column(DateTime, default=dt.now)
-    close_date = Column(DateTime)
\ No newline at end of file
+    close_date = Column(DateTime)
+    # Растёт при каждом UPDATE строки, в том числе пакетном:
+    # по нему вычисляется версия списков для ETag.
+    version = Column(
+        Integer, nullable=False, default=1, server_default=text('1'),
+        onupdate=literal_column('version') + 1)
\ No newline at end of file
@@ -1,9 +1,12 @@
 from app.schemas.charity_project import CharityCreate  # noqa
 from app.schemas.charity_project import CharityResponse  # noqa
 from app.schemas.charity_project import CharityUpdate  # noqa; naqa
+from app.schemas.donation import AllocationStatus  # noqa
 from app.schemas.donation import DonationPayload  # noqa
 from app.schemas.donation import DonationResponseFull  # noqa
 from app.schemas.donation import DonationResponsePartial  # noqa; noqa
+from app.schemas.stats import FundSummary  # noqa
+from app.schemas.user import PasswordHashingStatus  # noqa
 from app.schemas.user import UserCreate  # noqa
 from app.schemas.user import UserRead  # noqa
 from app.schemas.user import UserUpdate  # noqa; noqa
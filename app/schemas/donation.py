@@ -27,4 +27,10 @@ class DonationResponsePartial(DonationBase):
 
 
 class DonationResponseFull(SchemasMixin, DonationResponsePartial):
-    user_id: int
\ No newline at end of file
+    user_id: int
+
+
+class AllocationStatus(BaseModel):
+    queue_depth: int
+    oldest_unallocated: Optional[dt] = None
+    lag_seconds: float = 0
@@ -0,0 +1,18 @@
+from pydantic import BaseModel, root_validator
+
+
+class FundSummary(BaseModel):
+    total_raised: int
+    total_invested: int
+    open_projects: int
+    closed_projects: int
+    undistributed_balance: int = 0
+
+    @root_validator(skip_on_failure=True)
+    def calc_undistributed_balance(cls, values):
+        values['undistributed_balance'] = (
+            values['total_raised'] - values['total_invested'])
+        return values
+
+    class Config:
+        orm_mode = True
@@ -1,4 +1,5 @@
 from fastapi_users import schemas
+from pydantic import BaseModel
 
 
 class UserRead(schemas.BaseUser[int]):
@@ -10,4 +11,11 @@ class UserCreate(schemas.BaseUserCreate):
 
 
 class UserUpdate(schemas.BaseUserUpdate):
-    pass
\ No newline at end of file
+    pass
+
+
+class PasswordHashingStatus(BaseModel):
+    calls: int
+    pending: int
+    wait_avg: float
+    wait_max: float
@@ -42,12 +42,15 @@ except (NameError, ImportError):
         '`app.schemas.user`.',
     )
 
+from app.core.cache import project_list_cache  # noqa
+from app.core.user import user_cache  # noqa
 
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
 
 pytest_plugins = [
     'fixtures.user',
     'fixtures.data',
+    'fixtures.google',
 ]
 
 TEST_DB = BASE_DIR / 'test.db'
@@ -70,6 +73,9 @@ async def override_db():
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    # Фикстуры пишут в БД в обход приложения, кэш нужно сбросить.
+    project_list_cache.invalidate()
+    user_cache.invalidate()
     yield
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
@@ -0,0 +1,57 @@
+import pytest
+
+
+class FakeResource:
+    """Ресурс Google API: цепочка атрибутов собирается в имя метода.
+
+    Вызов `service.files.list(pageSize=2)` возвращает запрос
+    `('files.list', {'pageSize': 2})`, который затем отправляется
+    через `FakeGoogle.as_service_account`.
+    """
+
+    def __init__(self, path=''):
+        self.path = path
+
+    def __getattr__(self, name):
+        return FakeResource(f'{self.path}.{name}' if self.path else name)
+
+    def __call__(self, **params):
+        return self.path, params
+
+
+class FakeGoogle:
+    """Заменяет `Aiogoogle` и сервисы Google API в тестах.
+
+    Ответ на запрос задаётся в `responses` по имени метода: значением
+    или функцией от параметров запроса. Отправленные запросы
+    сохраняются в `requests`.
+    """
+
+    def __init__(self, monkeypatch):
+        self.monkeypatch = monkeypatch
+        self.responses = {}
+        self.requests = []
+
+    def attach(self, client):
+        async def get_api_service(wrapper_services, drive=False):
+            return FakeResource()
+
+        self.monkeypatch.setattr(
+            client, 'INFO', {'type': 'service_account'})
+        self.monkeypatch.setattr(
+            client, '_get_api_service', get_api_service)
+        return client
+
+    def sent(self, method):
+        return [params for name, params in self.requests if name == method]
+
+    async def as_service_account(self, request):
+        self.requests.append(request)
+        method, params = request
+        response = self.responses.get(method)
+        return response(**params) if callable(response) else response
+
+
+@pytest.fixture
+def fake_google(monkeypatch):
+    return FakeGoogle(monkeypatch)
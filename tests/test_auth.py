@@ -1,5 +1,20 @@
 
 
+import threading
+
+import pytest
+from conftest import TestingSessionLocal, engine
+from fastapi import HTTPException
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.password import password_helper
+from app.core.user import (UserManager, current_superuser_from_claims,
+                           get_jwt_strategy, token_revocation)
+from app.models.user import User
+
+
 def test_register(test_client):
     response = test_client.post('/auth/register', json={
         'email': 'dead@pool.com',
@@ -45,3 +60,122 @@ def test_register_invalid_pass(user_client):
         'При некорректной регистрации пользователя тело ответа API отличается '
         'от ожидаемого.'
     )
+
+
+def test_current_user_cached(test_client):
+    credentials = {'username': 'dead@pool.com', 'password': 'chimichangas'}
+    test_client.post('/auth/register', json={
+        'email': credentials['username'],
+        'password': credentials['password'],
+    })
+    token = test_client.post(
+        '/auth/jwt/login', data=credentials).json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    statements = []
+
+    def log_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', log_statement)
+    try:
+        first = test_client.get('/users/me', headers=headers)
+        second = test_client.get('/users/me', headers=headers)
+        updated = test_client.patch(
+            '/users/me', headers=headers, json={'email': 'wade@pool.com'})
+        third = test_client.get('/users/me', headers=headers)
+    finally:
+        event.remove(
+            engine.sync_engine, 'before_cursor_execute', log_statement)
+    assert first.json() == second.json(), (
+        'Повторный запрос с тем же токеном должен возвращать того же '
+        'пользователя.'
+    )
+    assert updated.status_code == 200, (
+        'Пользователь из кэша должен изменяться через `/users/me`.'
+    )
+    assert third.json()['email'] == 'wade@pool.com', (
+        'После изменения пользователя запись в кэше должна сбрасываться.'
+    )
+    selects = [
+        statement for statement in statements
+        if statement.lstrip().startswith('SELECT') and 'FROM user' in statement
+    ]
+    # Первый запрос, проверка e-mail и обновление объекта при изменении,
+    # запрос после сброса кэша.
+    assert len(selects) == 4, (
+        'Пользователь должен загружаться из БД только при промахе кэша.'
+    )
+
+
+@pytest.mark.asyncio
+async def test_password_hashed_in_executor(monkeypatch):
+    threads = []
+    hash_password = password_helper.hash
+
+    def hash_in_thread(password):
+        threads.append(threading.current_thread())
+        return hash_password(password)
+
+    monkeypatch.setattr(password_helper, 'hash', hash_in_thread)
+    calls = password_helper.metrics.calls
+    hashed = await password_helper.hash_async('chimichangas')
+    verified, _ = await password_helper.verify_and_update_async(
+        'chimichangas', hashed)
+    assert verified, 'Хеш из пула должен проходить проверку пароля.'
+    assert threads and threads[0] is not threading.main_thread(), (
+        'Пароль должен хешироваться вне цикла событий.'
+    )
+    assert password_helper.metrics.calls == calls + 2, (
+        'Каждое хеширование и проверка пароля должны попадать в метрики.'
+    )
+
+
+def test_password_hashing_status(superuser_client):
+    response = superuser_client.get('/auth/password-hashing')
+    assert response.status_code == 200, (
+        'Состояние пула хеширования должно быть доступно суперпользователю.'
+    )
+    assert sorted(response.json()) == [
+        'calls', 'pending', 'wait_avg', 'wait_max'], (
+        'В состоянии пула хеширования должны быть число вызовов, задач '
+        'в пуле и время ожидания.'
+    )
+
+
+def test_password_hashing_status_user(user_client):
+    response = user_client.get('/auth/password-hashing')
+    assert response.status_code == 401, (
+        'Состояние пула хеширования не должно быть доступно пользователю.'
+    )
+
+
+@pytest.mark.asyncio
+async def test_superuser_from_claims(monkeypatch):
+    monkeypatch.setattr(settings, 'superuser_claims', True)
+    strategy = get_jwt_strategy()
+    admin = await strategy.write_token(
+        User(id=1, is_active=True, is_superuser=True))
+    user = await strategy.write_token(
+        User(id=2, is_active=True, is_superuser=False))
+    # Без запроса к БД менеджер пользователей не нужен.
+    superuser = await current_superuser_from_claims(admin, None)
+    assert superuser.id == 1 and superuser.is_superuser, (
+        'Права суперпользователя должны проверяться по утверждениям токена.'
+    )
+    with pytest.raises(HTTPException) as error:
+        await current_superuser_from_claims(user, None)
+    assert error.value.status_code == 403, (
+        'Токен без прав суперпользователя должен отклоняться со статусом 403.'
+    )
+    token_revocation.revoke(1)
+    try:
+        async with TestingSessionLocal() as session:
+            user_manager = UserManager(
+                SQLAlchemyUserDatabase(session, User), password_helper)
+            with pytest.raises(HTTPException) as error:
+                await current_superuser_from_claims(admin, user_manager)
+    finally:
+        token_revocation.clear()
+    assert error.value.status_code == 401, (
+        'Отозванный токен должен проверяться по БД.'
+    )
@@ -1,6 +1,11 @@
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta
 
 import pytest
+from conftest import TestingSessionLocal
+
+from app.core.cache import ResponseCache
+from app.crud import charity_crud
 
 
 @pytest.mark.parametrize(
@@ -691,3 +696,127 @@ def test_get_all_charity_project_not_auth_user(test_client,
             'name': 'nunchaku'
         }
     ]
+
+
+def test_get_all_charity_project_pagination(test_client, charity_project,
+                                            charity_project_nunchaku):
+    response = test_client.get('/charity_project/', params={'limit': 1})
+    assert response.status_code == 200
+    assert [project['id'] for project in response.json()] == [1], (
+        'Параметр `limit` должен ограничивать размер страницы.'
+    )
+    cursor = response.headers.get('X-Next-Cursor')
+    assert cursor, (
+        'Если есть следующая страница, в заголовке `X-Next-Cursor` '
+        'должен возвращаться её курсор.'
+    )
+    response = test_client.get(
+        '/charity_project/', params={'limit': 1, 'after': cursor})
+    assert [project['id'] for project in response.json()] == [2], (
+        'По курсору должна возвращаться следующая страница.'
+    )
+    assert 'X-Next-Cursor' not in response.headers, (
+        'Для последней страницы курсор возвращаться не должен.'
+    )
+    response = test_client.get(
+        '/charity_project/', params={'limit': 1, 'unpaginated': True})
+    assert len(response.json()) == 2, (
+        'С `unpaginated=true` должен возвращаться весь список.'
+    )
+
+
+def test_get_all_charity_project_invalid_cursor(test_client):
+    response = test_client.get('/charity_project/', params={'after': 'abc'})
+    assert response.status_code == 400, (
+        'При некорректном курсоре должен возвращаться статус-код 400.'
+    )
+
+
+def test_get_all_charity_project_cache_invalidation(
+    superuser_client, charity_project
+):
+    assert len(superuser_client.get('/charity_project/').json()) == 1
+    superuser_client.post('/charity_project/', json={
+        'name': 'Мяу-мяу',
+        'description': 'Кэш списка проектов',
+        'full_amount': 100,
+    })
+    assert len(superuser_client.get('/charity_project/').json()) == 2, (
+        'После создания проекта кэш списка проектов должен сбрасываться.'
+    )
+    superuser_client.patch(
+        f'/charity_project/{charity_project.id}', json={'full_amount': 6000})
+    assert superuser_client.get('/charity_project/').json()[0][
+        'full_amount'] == 6000, (
+        'После изменения проекта кэш списка проектов должен сбрасываться.'
+    )
+
+
+async def test_response_cache_single_flight():
+    cache = ResponseCache(ttl=60, max_bytes=1024)
+    calls = []
+
+    async def load():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        return b'[]', {}
+
+    results = await asyncio.gather(
+        *(cache.get_or_load('key', load) for _ in range(10)))
+    assert len(calls) == 1, (
+        'Одновременные промахи кэша должны выполнять один запрос к БД.'
+    )
+    assert all(result == (b'[]', {}) for result in results)
+
+    async def load_and_invalidate():
+        cache.invalidate()
+        return await load()
+
+    await cache.get_or_load('other', load_and_invalidate)
+    await cache.get_or_load('other', load)
+    assert len(calls) == 3, (
+        'Данные, загруженные до сброса кэша, не должны в нём сохраняться.'
+    )
+
+
+def test_get_all_charity_project_etag(superuser_client, charity_project):
+    response = superuser_client.get('/charity_project/')
+    etag = response.headers.get('ETag')
+    assert etag, 'Список проектов должен возвращаться с заголовком `ETag`.'
+    response = superuser_client.get(
+        '/charity_project/', headers={'If-None-Match': etag})
+    assert response.status_code == 304, (
+        'Неизменившийся список проектов должен возвращаться ответом 304.'
+    )
+    assert not response.content
+    superuser_client.patch(
+        f'/charity_project/{charity_project.id}',
+        json={'description': 'Новое описание'})
+    response = superuser_client.get(
+        '/charity_project/', headers={'If-None-Match': etag})
+    assert response.status_code == 200, (
+        'После изменения проекта `ETag` списка проектов должен меняться.'
+    )
+    assert response.headers['ETag'] != etag
+
+
+async def test_projects_by_completion_rate(mixer):
+    start = datetime(2020, 1, 1)
+    for name, days in (('slow', 30), ('fast', 1), ('open', None), ('mid', 7)):
+        mixer.blend(
+            'app.models.charity_project.CharityProject',
+            name=name,
+            description=name,
+            full_amount=100,
+            invested_amount=100 if days else 0,
+            fully_invested=days is not None,
+            create_date=start,
+            close_date=start + timedelta(days=days) if days else None,
+        )
+    async with TestingSessionLocal() as session:
+        projects = await charity_crud.get_projects_by_completion_rate(
+            session, limit=2, fields=('name',))
+    assert [project.name for project in projects] == ['fast', 'mid'], (
+        'Закрытые проекты должны сортироваться по скорости сбора средств, '
+        'а число строк — ограничиваться `limit`.'
+    )
@@ -55,3 +55,53 @@ def test_check_db_url():
                 'Укажите значение по умолчанию для подключения базы данных '
                 'sqlite '
             )
+
+
+def test_engine_options():
+    from app.core.db import get_engine_options
+
+    assert get_engine_options('sqlite+aiosqlite:///./fastapi.db') == {}, (
+        'Для SQLite параметры пула соединений не передаются.'
+    )
+    options = get_engine_options('postgresql+asyncpg://user@host/db')
+    assert options['pool_size'] == Settings().pool_size, (
+        'Размер пула соединений должен браться из настроек.'
+    )
+    assert options['connect_args']['statement_cache_size'] == (
+        Settings().statement_cache_size
+    )
+    assert 'statement_timeout' in options['connect_args']['server_settings']
+
+
+async def test_replica_router():
+    from conftest import TestingSessionLocal
+
+    from app.core.db import ReplicaRouter
+
+    primary = object()
+    router = ReplicaRouter(TestingSessionLocal, primary, max_lag=0)
+    assert await router.get_session_factory() is TestingSessionLocal, (
+        'Без допустимого отставания чтение всегда идёт с реплики.'
+    )
+    # SQLite не поддерживает запрос отставания реплики.
+    router = ReplicaRouter(
+        TestingSessionLocal, primary, max_lag=5, check_interval=60)
+    assert await router.get_session_factory() is primary, (
+        'Если отставание реплики не удалось проверить, '
+        'чтение должно идти с основной БД.'
+    )
+
+
+def test_describe_pool_status(monkeypatch):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.core import db
+
+    monkeypatch.setattr(db, 'replica_engine', create_async_engine(
+        'postgresql+asyncpg://user@replica/db', pool_size=3))
+    status = db.describe_pool_status()
+    assert status.startswith('primary: ') and '; replica: ' in status, (
+        'При исчерпании соединений в журнал должно попадать состояние '
+        'пулов основной БД и реплики.'
+    )
+    assert 'Pool size: 3' in status.split('; replica: ')[1]
@@ -1,6 +1,10 @@
+import json
 from datetime import datetime
 
 import pytest
+from conftest import TestingSessionLocal
+
+from app.core.allocation import DeferredAllocator
 
 
 @pytest.mark.parametrize('json, keys, expected_data', [
@@ -197,3 +201,87 @@ def test_create_donation_check_create_date(user_client):
         'При создании двух пожертвований с паузой (в 1 секунду, например) у '
         'них должны быть разные `create_date`'
     )
+
+
+def test_allocation_status(superuser_client, donation, another_donation):
+    response = superuser_client.get('/donation/allocation')
+    assert response.status_code == 200, (
+        'Суперпользователю должно быть доступно состояние распределения.'
+    )
+    data = response.json()
+    assert data['queue_depth'] == 2, (
+        'В очереди должны учитываться все нераспределённые пожертвования.'
+    )
+    assert data['oldest_unallocated'] == '2011-11-11T00:00:00', (
+        'Должно возвращаться время создания самого старого '
+        'нераспределённого пожертвования.'
+    )
+
+
+def test_allocation_status_user(user_client):
+    response = user_client.get('/donation/allocation')
+    assert response.status_code == 401, (
+        'Состояние распределения должно быть доступно только суперюзеру.'
+    )
+
+
+async def test_deferred_allocation(donation, another_donation,
+                                   charity_project):
+    allocator = DeferredAllocator(TestingSessionLocal)
+    assert await allocator.run_once(), (
+        'Фоновое распределение должно обработать открытые объекты.'
+    )
+    assert not await allocator.run_once(), (
+        'После распределения открытых пожертвований не должно остаться.'
+    )
+    assert charity_project.invested_amount == 2100
+    assert donation.fully_invested and another_donation.fully_invested
+
+
+def test_export_donations(superuser_client, donation, another_donation):
+    response = superuser_client.get('/donation/export')
+    assert response.status_code == 200, (
+        'Суперпользователю должна быть доступна выгрузка пожертвований.'
+    )
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row['id'] for row in rows] == [1, 2], (
+        'В выгрузке NDJSON каждое пожертвование должно быть '
+        'отдельной строкой.'
+    )
+    assert rows[0]['comment'] == 'To you for chimichangas'
+    response = superuser_client.get(
+        '/donation/export', params={'format': 'csv'})
+    assert response.headers['content-type'].startswith('text/csv')
+    lines = response.text.splitlines()
+    assert len(lines) == 3, (
+        'Выгрузка CSV должна содержать заголовок и строку на каждое '
+        'пожертвование.'
+    )
+    assert lines[0].split(',')[0] == 'full_amount'
+
+
+def test_export_donations_user(user_client):
+    response = user_client.get('/donation/export')
+    assert response.status_code == 401, (
+        'Выгрузка пожертвований должна быть доступна только суперюзеру.'
+    )
+
+
+def test_get_user_donations_etag(user_client):
+    response = user_client.get('/donation/my')
+    etag = response.headers.get('ETag')
+    assert etag, 'Список пожертвований должен возвращаться с `ETag`.'
+    response = user_client.get(
+        '/donation/my', headers={'If-None-Match': f'"other", {etag}'})
+    assert response.status_code == 304, (
+        'Неизменившийся список пожертвований должен возвращаться '
+        'ответом 304.'
+    )
+    user_client.post('/donation/', json={'full_amount': 100})
+    response = user_client.get(
+        '/donation/my', headers={'If-None-Match': etag})
+    assert response.status_code == 200, (
+        'После нового пожертвования `ETag` списка должен меняться.'
+    )
+    assert len(response.json()) == 1
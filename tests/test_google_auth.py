@@ -1,6 +1,18 @@
+import asyncio
+import json
+import time
 import types
+from datetime import datetime, timedelta
 
-from app.google_package.base import GoogleBaseClient
+import pytest
+from aiogoogle import Aiogoogle, HTTPError
+from aiogoogle.models import Response
+from aiohttp import ClientConnectionError
+from conftest import TestingSessionLocal, app
+
+from app.core.config import settings
+from app.google_package.base import DiscoveryCache, GoogleBaseClient
+from app.google_package.client import GoogleClient, google_client
 
 try:
     from app.google_package import base
@@ -57,4 +69,254 @@ def test_connect():
     )
     assert isinstance(GoogleBaseClient().get_google_service(), types.AsyncGeneratorType), (
         'Функция `GoogleBaseClient.get_google_service` должна возвращать асинхронный генератор.'
-    )
\ No newline at end of file
+    )
+
+
+@pytest.mark.asyncio
+async def test_google_service_shared():
+    client = GoogleBaseClient()
+    first = await client.get_google_service().__anext__()
+    second = await client.get_google_service().__anext__()
+    assert first is second, (
+        'Запросы к Google должны использовать один клиент `Aiogoogle`.'
+    )
+    session = first.session_factory()
+    async with first.session_factory() as other:
+        assert other is session, (
+            'Клиент `Aiogoogle` должен использовать одну сессию aiohttp.'
+        )
+    assert not session.closed, (
+        'Сессия aiohttp не должна закрываться после запроса.'
+    )
+    await client.stop()
+    assert session.closed, (
+        'Сессия aiohttp должна закрываться при остановке приложения.'
+    )
+
+
+@pytest.mark.asyncio
+async def test_discovery_cache(tmp_path):
+    requests = []
+
+    async def as_anon(request):
+        requests.append(request)
+        return {
+            'name': 'drive', 'version': 'v3', 'rootUrl': '',
+            'servicePath': '', 'parameters': {}, 'resources': {},
+        }
+
+    wrapper_services = Aiogoogle()
+    wrapper_services.as_anon = as_anon
+    path = str(tmp_path / 'discovery.json')
+    cache = DiscoveryCache(ttl=60, path=path)
+    first = await cache.discover(wrapper_services, 'drive', 'v3')
+    second = await cache.discover(wrapper_services, 'drive', 'v3')
+    assert len(requests) == 1 and first is second, (
+        'Discovery-документ должен загружаться один раз.'
+    )
+    preloaded = DiscoveryCache(ttl=60, path=path)
+    assert preloaded.load() == 1, (
+        'Discovery-документы должны загружаться из файла кэша.'
+    )
+    await preloaded.discover(wrapper_services, 'drive', 'v3')
+    assert len(requests) == 1, (
+        'Документ из файла кэша не должен загружаться повторно.'
+    )
+    assert DiscoveryCache(ttl=0, path=path).load() == 0, (
+        'Отключённый кэш не должен читать файл.'
+    )
+
+
+@pytest.mark.asyncio
+async def test_discovery_cache_saves_copy(tmp_path, monkeypatch):
+    async def as_anon(request):
+        return {
+            'name': 'drive', 'version': 'v3', 'rootUrl': '',
+            'servicePath': '', 'parameters': {}, 'resources': {},
+        }
+
+    wrapper_services = Aiogoogle()
+    wrapper_services.as_anon = as_anon
+    cache = DiscoveryCache(ttl=60, path=str(tmp_path / 'discovery.json'))
+    saved = []
+    monkeypatch.setattr(cache, 'save', saved.append)
+    await cache.discover(wrapper_services, 'drive', 'v3')
+    await cache.discover(wrapper_services, 'sheets', 'v4')
+    assert [[entry['name'] for entry in entries] for entries in saved] == [
+        ['drive'], ['drive', 'sheets']], (
+        'В файл кэша должна записываться копия документов, '
+        'сделанная до передачи в поток.'
+    )
+
+
+def test_discovery_cache_malformed_file(tmp_path):
+    path = tmp_path / 'discovery.json'
+    path.write_text(json.dumps([
+        {'name': 'drive'},
+        'drive',
+        {'name': 'drive', 'version': 'v3', 'fetched_at': 'now',
+         'document': {}},
+        {'name': 'sheets', 'version': 'v4', 'fetched_at': time.time(),
+         'document': {'name': 'sheets'}},
+    ]))
+    cache = DiscoveryCache(ttl=60, path=str(path))
+    assert cache.load() == 1, (
+        'Некорректные записи файла кэша должны пропускаться.'
+    )
+    cache.save()
+    assert [file.name for file in tmp_path.iterdir()] == ['discovery.json'], (
+        'Файл кэша должен заменяться целиком, без временных файлов.'
+    )
+    assert DiscoveryCache(ttl=60, path=str(path)).load() == 1
+
+
+@pytest.mark.asyncio
+async def test_clear_disk_partial_failure(monkeypatch, fake_google):
+    monkeypatch.setattr(settings, 'google_retry_base_delay', 0)
+    attempts = {}
+
+    def delete(fileId):
+        attempts[fileId] = attempts.get(fileId, 0) + 1
+        if fileId == 'quota' and attempts[fileId] < 3:
+            raise HTTPError('quota', res=Response(status_code=429))
+        if fileId == 'missing':
+            raise HTTPError('missing', res=Response(
+                status_code=404,
+                json={'error': {'message': 'File not found'}}))
+        if fileId == 'offline':
+            raise ClientConnectionError('Connection reset')
+        if fileId == 'slow':
+            raise asyncio.TimeoutError
+
+    fake_google.responses['files.list'] = {'files': [
+        {'id': file_id, 'name': file_id}
+        for file_id in ('ok', 'quota', 'missing', 'offline', 'slow')]}
+    fake_google.responses['files.delete'] = delete
+    client = fake_google.attach(GoogleBaseClient())
+    result = await client.clear_disk(fake_google)
+    assert (result['deleted'], result['failed']) == (2, 3), (
+        'Ошибка удаления одной таблицы не должна прерывать очистку диска.'
+    )
+    assert attempts == {
+        'ok': 1, 'quota': 3, 'missing': 1, 'offline': 1, 'slow': 1}, (
+        'Повторять удаление нужно только при превышении квоты.'
+    )
+    errors = {
+        file['id']: file.get('error', file['status'])
+        for file in result['files']}
+    assert errors == {
+        'ok': 'deleted',
+        'quota': 'deleted',
+        'missing': 'File not found',
+        'offline': 'Connection reset',
+        'slow': 'TimeoutError',
+    }, (
+        'В ответе должен быть результат удаления каждой таблицы.'
+    )
+
+
+@pytest.mark.asyncio
+async def test_send_without_retries(monkeypatch, fake_google):
+    monkeypatch.setattr(settings, 'google_retry_attempts', 0)
+    fake_google.responses['files.delete'] = 'deleted'
+    client = fake_google.attach(GoogleBaseClient())
+    result = await client._send_with_retry(
+        fake_google, ('files.delete', {'fileId': 'ok'}))
+    assert result == 'deleted' and len(fake_google.requests) == 1, (
+        'Запрос должен отправляться хотя бы один раз.'
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_all_spreadsheets_pages(monkeypatch, fake_google):
+    monkeypatch.setattr(settings, 'google_page_size', 2)
+    pages = {
+        None: {'files': [{'id': '1'}, {'id': '2'}], 'nextPageToken': 'next'},
+        'next': {'files': [{'id': '3'}]},
+    }
+    fake_google.responses['files.list'] = (
+        lambda pageToken=None, **params: pages[pageToken])
+    client = fake_google.attach(GoogleBaseClient())
+    spreadsheets = client.get_all_spreadsheets(fake_google)
+    assert not fake_google.requests, (
+        'Страницы должны запрашиваться при обходе списка.'
+    )
+    ids = [spreadsheet['id'] async for spreadsheet in spreadsheets]
+    assert ids == ['1', '2', '3'], (
+        'Список таблиц должен включать все страницы ответа Google Drive.'
+    )
+    assert all(
+        params['pageSize'] == 2 and 'nextPageToken' in params['fields']
+        for params in fake_google.sent('files.list')), (
+        'Запрос списка должен ограничивать поля и размер страницы.'
+    )
+
+
+@pytest.mark.asyncio
+async def test_upload_report_in_chunks(mixer, monkeypatch, fake_google):
+    monkeypatch.setattr(settings, 'google_write_chunk_rows', 4)
+    start = datetime(2020, 1, 1)
+    for days in range(1, 8):
+        mixer.blend(
+            'app.models.charity_project.CharityProject',
+            name=f'project-{days}',
+            full_amount=100,
+            invested_amount=100,
+            fully_invested=True,
+            create_date=start,
+            close_date=start + timedelta(days=days),
+        )
+    fake_google.responses['spreadsheets.create'] = {
+        'spreadsheetId': 'report'}
+    client = fake_google.attach(GoogleClient())
+    async with TestingSessionLocal() as session:
+        await client.upload(fake_google, session)
+    [create] = fake_google.sent('spreadsheets.create')
+    grid = create['json']['sheets'][0]['properties']['gridProperties']
+    assert grid['rowCount'] == 10, (
+        'Размер таблицы должен определяться числом строк отчёта.'
+    )
+    writes = [
+        params['json']['data'][0]
+        for params in fake_google.sent('spreadsheets.values.batchUpdate')]
+    assert [write['range'].split('!')[1] for write in writes] == [
+        'A1', 'A5', 'A9'], (
+        'Строки отчёта должны записываться частями подряд.'
+    )
+    rows = [row for write in writes for row in write['values']]
+    assert [row[0] for row in rows[3:]] == [
+        f'project-{days}' for days in range(1, 8)], (
+        'В отчёт должны попадать все закрытые проекты по скорости сбора.'
+    )
+
+
+@pytest.mark.parametrize('pages, status_code, expected', [
+    ({None: {'files': [{'id': '1'}, {'id': '2'}], 'nextPageToken': 'next'},
+      'next': {'files': [{'id': '3'}]}}, 200,
+     [{'id': '1'}, {'id': '2'}, {'id': '3'}]),
+    ({None: {}}, 200, []),
+    (None, 502, None),
+])
+def test_get_all_spreadsheets_api(
+    superuser_client, fake_google, pages, status_code, expected,
+):
+    def list_files(pageToken=None, **params):
+        if pages is None:
+            raise HTTPError('denied', res=Response(
+                status_code=403,
+                json={'error': {'message': 'Insufficient permissions'}}))
+        return pages[pageToken]
+
+    fake_google.responses['files.list'] = list_files
+    fake_google.attach(google_client)
+    app.dependency_overrides[google_client.get_google_service] = (
+        lambda: fake_google)
+    response = superuser_client.get('/google/')
+    assert response.status_code == status_code, (
+        'Ошибка первого запроса к Google Drive должна возвращаться '
+        'статусом ответа, а не обрывать поток.'
+    )
+    if expected is not None:
+        assert response.json() == expected, (
+            'Список таблиц должен передаваться целиком.'
+        )
@@ -1,3 +1,27 @@
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from conftest import Base, TestingSessionLocal, engine
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.allocation import AllocationCoordinator
+from app.core.config import settings
+from app.core.utils import (calculate_investments, calculate_investments_bulk,
+                            calculate_investments_sql, invest)
+from app.models import CharityProject, Donation, Investment
+
+POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+requires_postgres = pytest.mark.skipif(
+    POSTGRES_URL is None,
+    reason='Для проверки SQL-распределения нужен TEST_POSTGRES_URL.')
+
+
 def test_donation_exist_non_project(superuser_client, donation):
     response_donation = superuser_client.get('/donation/')
     data_donation = response_donation.json()
@@ -55,3 +79,276 @@ def test_donation_to_little_invest_project(
     )
     assert not charity_project_nunchaku.fully_invested, common_asser_msg
     assert charity_project_nunchaku.invested_amount == 0, common_asser_msg
+
+
+def test_donation_walks_projects_in_chunks(user_client, mixer, monkeypatch):
+    monkeypatch.setattr(settings, 'allocation_chunk_size', 2)
+    projects = [
+        mixer.blend(
+            'app.models.charity_project.CharityProject',
+            name=f'project_{number}',
+            description='small project',
+            full_amount=100,
+            invested_amount=0,
+            fully_invested=False,
+        ) for number in range(5)
+    ]
+    user_client.post('/donation/', json={'full_amount': 350})
+    assert [project.invested_amount for project in projects] == [
+        100, 100, 100, 50, 0
+    ], (
+        'Пожертвование должно распределяться по открытым проектам в порядке '
+        'их создания, пока не будет исчерпана его сумма.'
+    )
+    assert [project.fully_invested for project in projects] == [
+        True, True, True, False, False
+    ]
+
+
+async def test_coordinator_allocates_queued_donations(charity_project, mixer):
+    donations = [
+        mixer.blend(
+            'app.models.donation.Donation',
+            user_id=2,
+            full_amount=100,
+            invested_amount=0,
+            fully_invested=False,
+        ) for _ in range(3)
+    ]
+    coordinator = AllocationCoordinator(TestingSessionLocal)
+    await coordinator.start()
+    await asyncio.gather(*(
+        coordinator.submit(Donation, donation.id) for donation in donations
+    ))
+    await coordinator.stop()
+    assert charity_project.invested_amount == 300, (
+        'Все пожертвования из очереди координатора должны быть '
+        'распределены в открытый проект.'
+    )
+    async with TestingSessionLocal() as session:
+        donations = await session.scalars(select(Donation))
+        assert all(donation.fully_invested for donation in donations), (
+            'Пожертвования из очереди координатора должны быть закрыты.'
+        )
+
+
+async def test_allocation_coordinator_stop_during_batch():
+    processing = asyncio.Event()
+
+    def blocked_session():
+        processing.set()
+        return TestingSessionLocal()
+
+    coordinator = AllocationCoordinator(blocked_session)
+    await coordinator.start()
+    submitted = asyncio.ensure_future(coordinator.submit(Donation, 1))
+    await processing.wait()
+    await coordinator.stop()
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(submitted, timeout=1)
+
+
+async def test_investment_ledger(user_client, charity_project_little_invested,
+                                 charity_project_nunchaku):
+    user_client.post('/donation/', json={'full_amount': 1000000})
+    async with TestingSessionLocal() as session:
+        investments = (await session.execute(
+            select(
+                Investment.donation_id,
+                Investment.project_id,
+                Investment.amount,
+            ).order_by(Investment.id)
+        )).all()
+    assert [tuple(investment) for investment in investments] == [
+        (1, 1, 999900), (1, 2, 100)
+    ], (
+        'Каждый перевод средств пожертвования в проект должен '
+        'записываться в журнал инвестиций.'
+    )
+
+
+async def test_invest_updates_object_without_refresh(
+        charity_project_little_invested, charity_project_nunchaku):
+    statements = []
+
+    def log_statement(conn, cursor, statement, *args):
+        statements.append(statement.split()[0])
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', log_statement)
+    try:
+        async with TestingSessionLocal(expire_on_commit=False) as session:
+            donation = Donation(full_amount=1000000, user_id=1)
+            session.add(donation)
+            await session.commit()
+            statements.clear()
+            await invest(session, donation)
+    finally:
+        event.remove(
+            engine.sync_engine, 'before_cursor_execute', log_statement)
+    assert donation.fully_invested, (
+        'Результат распределения должен попадать в объект пожертвования.'
+    )
+    assert donation.invested_amount == 1000000
+    assert donation.close_date is not None
+    assert statements.count('SELECT') == 1, (
+        'Новый объект не должен перечитываться из БД ни до, ни после '
+        'распределения.'
+    )
+
+
+async def test_update_closes_project_funded_concurrently(
+        charity_project_little_invested):
+    async with TestingSessionLocal(expire_on_commit=False) as session:
+        project = await session.get(
+            CharityProject, charity_project_little_invested.id)
+        project.full_amount = 500
+        await session.commit()
+        async with TestingSessionLocal() as other:
+            await other.execute(
+                update(CharityProject)
+                .where(CharityProject.id == project.id)
+                .values(invested_amount=500))
+            await other.commit()
+        await calculate_investments(session, project)
+    async with TestingSessionLocal() as session:
+        project = await session.get(CharityProject, project.id)
+    assert project.fully_invested, (
+        'Проект должен закрываться, если распределение набрало сумму '
+        'после фиксации изменений проекта.'
+    )
+
+
+async def replay_allocation(
+    seed, allocate, bind=engine, session_factory=TestingSessionLocal,
+):
+    async with bind.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    generator = random.Random(seed)
+    async with session_factory() as session:
+        for number in range(generator.randint(0, 30)):
+            full_amount = generator.randint(1, 100)
+            session.add(CharityProject(
+                name=f'project_{number}',
+                description='project',
+                full_amount=full_amount,
+                invested_amount=generator.randint(0, full_amount - 1),
+                fully_invested=False,
+                create_date=datetime(2020, 1, 1) + timedelta(
+                    days=generator.randint(0, 5)),
+            ))
+        for _ in range(generator.randint(0, 30)):
+            full_amount = generator.randint(1, 100)
+            session.add(Donation(
+                full_amount=full_amount,
+                invested_amount=generator.randint(0, full_amount - 1),
+                fully_invested=False,
+                create_date=datetime(2020, 1, 1) + timedelta(
+                    days=generator.randint(0, 5)),
+            ))
+        await session.commit()
+    async with session_factory() as session:
+        await allocate(session)
+    async with session_factory() as session:
+        state = []
+        for model in (CharityProject, Donation):
+            state.append((await session.execute(
+                select(
+                    model.id,
+                    model.invested_amount,
+                    model.fully_invested,
+                    model.close_date.is_(None),
+                ).order_by(model.id)
+            )).all())
+        state.append(sorted((await session.execute(
+            select(
+                Investment.donation_id,
+                Investment.project_id,
+                Investment.amount,
+            )
+        )).all()))
+        return state
+
+
+async def allocate_with_loop(session):
+    open_objects = []
+    for model in (CharityProject, Donation):
+        open_objects.append((await session.scalars(
+            select(model)
+            .where(model.fully_invested.is_(False))
+            .order_by(model.create_date, model.id)
+        )).all())
+    await calculate_investments(session, *open_objects)
+
+
+@pytest.mark.parametrize('seed', range(20))
+async def test_bulk_allocation_matches_loop(seed):
+    assert (
+        await replay_allocation(seed, calculate_investments_bulk) ==
+        await replay_allocation(seed, allocate_with_loop)
+    ), (
+        'Векторизованное распределение должно давать тот же результат, '
+        'что и распределение в цикле.'
+    )
+
+
+@pytest_asyncio.fixture
+async def postgres():
+    postgres_engine = create_async_engine(POSTGRES_URL)
+    yield postgres_engine, sessionmaker(
+        class_=AsyncSession, autocommit=False, autoflush=False,
+        bind=postgres_engine)
+    async with postgres_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await postgres_engine.dispose()
+
+
+async def allocate_with_sql(session):
+    await calculate_investments_sql(session)
+    await session.commit()
+
+
+@requires_postgres
+@pytest.mark.parametrize('seed', range(20))
+async def test_sql_allocation_matches_loop(seed, postgres):
+    assert (
+        await replay_allocation(seed, allocate_with_sql, *postgres) ==
+        await replay_allocation(seed, allocate_with_loop, *postgres)
+    ), (
+        'Распределение в PostgreSQL должно давать тот же результат, '
+        'что и распределение в цикле.'
+    )
+
+
+@requires_postgres
+async def test_sql_allocation_concurrent(postgres):
+    postgres_engine, session_factory = postgres
+    async with postgres_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_factory() as session:
+        session.add_all([
+            CharityProject(
+                name=f'project_{number}', description='project',
+                full_amount=100)
+            for number in range(5)])
+        session.add_all([Donation(full_amount=60) for _ in range(10)])
+        await session.commit()
+
+    async with session_factory() as first, session_factory() as second:
+        await calculate_investments_sql(first)
+        # Второе распределение начинается до коммита первого.
+        concurrent = asyncio.create_task(allocate_with_sql(second))
+        await asyncio.sleep(0.2)
+        await first.commit()
+        await concurrent
+    async with session_factory() as session:
+        overfunded = await session.scalar(
+            select(func.count(CharityProject.id))
+            .where(CharityProject.invested_amount > CharityProject.full_amount))
+        invested = await session.scalar(
+            select(func.sum(CharityProject.invested_amount)))
+        ledger = await session.scalar(select(func.sum(Investment.amount)))
+    assert overfunded == 0 and invested == ledger == 500, (
+        'Параллельные распределения не должны применять перевод дважды.'
+    )
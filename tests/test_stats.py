@@ -0,0 +1,73 @@
+from conftest import TestingSessionLocal, engine
+from sqlalchemy import event
+
+from app import schemas
+from app.core.summary import reconcile_summary
+from app.crud import charity_crud
+
+
+async def test_stats(user_client):
+    async with TestingSessionLocal() as session:
+        for name, full_amount in (('first', 100), ('second', 200)):
+            await charity_crud.create(session, schemas.CharityCreate(
+                name=name, description=name, full_amount=full_amount))
+    user_client.post('/donation/', json={'full_amount': 150})
+    user_client.post('/donation/', json={'full_amount': 300})
+    response = user_client.get('/stats')
+    assert response.status_code == 200, (
+        'Итоги фонда должны быть доступны всем пользователям.'
+    )
+    assert response.json() == {
+        'total_raised': 450,
+        'total_invested': 300,
+        'open_projects': 0,
+        'closed_projects': 2,
+        'undistributed_balance': 150,
+    }, (
+        'Итоги фонда должны обновляться при создании объектов '
+        'и распределении пожертвований.'
+    )
+
+
+async def test_reconcile_summary(user_client, charity_project, donation):
+    assert user_client.get('/stats').json()['open_projects'] == 0
+    async with TestingSessionLocal() as session:
+        drift = await reconcile_summary(session)
+    assert drift == {'total_raised': 100, 'open_projects': 1}, (
+        'Сверка должна сообщать о расхождении итогов с данными.'
+    )
+    data = user_client.get('/stats').json()
+    assert (data['total_raised'], data['open_projects']) == (100, 1), (
+        'Сверка должна исправлять итоги фонда.'
+    )
+    async with TestingSessionLocal() as session:
+        assert await reconcile_summary(session) == {}
+
+
+async def test_summary_updated_last(user_client):
+    statements = []
+
+    def log_statement(conn, cursor, statement, *args):
+        statements.append(' '.join(statement.split()[:3]))
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', log_statement)
+    try:
+        async with TestingSessionLocal() as session:
+            project = await charity_crud.create(session, schemas.CharityCreate(
+                name='first', description='first', full_amount=100))
+            await charity_crud.delete(session, project.id)
+    finally:
+        event.remove(
+            engine.sync_engine, 'before_cursor_execute', log_statement)
+    writes = [
+        statement for statement in statements
+        if statement.split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+    assert writes == [
+        'INSERT INTO charityproject',
+        'UPDATE fundsummary SET',
+        'DELETE FROM charityproject',
+        'UPDATE fundsummary SET',
+    ], (
+        'Итоги фонда должны обновляться после записи самого объекта, '
+        'чтобы строка итогов блокировалась последней.'
+    )